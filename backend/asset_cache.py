@@ -0,0 +1,93 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+
+def normalize_plant_name(name: str) -> str:
+    name = re.sub(r"[^a-z0-9]+", " ", name.lower())
+    return " ".join(name.split())
+
+
+class AssetCache:
+    """LRU index of generated assets keyed on plant name and generation params.
+
+    Only asset URLs are stored, so a hit lets a job skip image generation and
+    the TSR run entirely. The index is persisted as JSON so it survives
+    restarts.
+    """
+
+    def __init__(
+        self,
+        index_path: str = "cache/assets.json",
+        max_entries: int = 1000,
+        on_evict: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    ):
+        self.index_path = index_path
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def key(plant_name: str, **params) -> str:
+        payload = json.dumps(
+            {"plant": normalize_plant_name(plant_name), **params}, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            entry["last_used_at"] = time.time()
+            return dict(entry)
+
+    def put(self, key: str, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = {**entry, "last_used_at": time.time()}
+            self._entries.move_to_end(key)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False))
+            self._save()
+        for evicted_key, evicted_entry in evicted:
+            logging.info(f"Evicted {evicted_entry.get('plant')} from asset cache")
+            if self.on_evict is not None:
+                self.on_evict(evicted_key, evicted_entry)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(entry) for entry in self._entries.values()]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load(self) -> None:
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            logging.warning(f"Ignoring unreadable asset cache index {self.index_path}")
+            return
+        for key, entry in sorted(entries.items(), key=lambda kv: kv[1].get("last_used_at", 0)):
+            self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f, indent=4)
+        os.replace(tmp_path, self.index_path)
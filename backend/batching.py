@@ -0,0 +1,172 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Tuple
+
+import PIL.Image
+
+from model_registry import ModelRegistry
+
+if TYPE_CHECKING:
+    import torch
+
+
+@dataclass
+class _Request:
+    item: Any
+    future: Future = field(default_factory=Future)
+
+
+class _Batcher:
+    """Collects concurrent requests and runs them through `_run_batch`
+    together.
+
+    Pending items are collected for up to `max_wait_ms` after the first one
+    arrives, or until `max_batch_size` are queued. With `num_workers` > 1
+    several batches run at once, one per worker thread; `worker_init(index)`
+    runs first on each of them.
+    """
+
+    thread_name = "batcher"
+
+    def __init__(
+        self,
+        max_batch_size: int = 4,
+        max_wait_ms: float = 10.0,
+        num_workers: int = 1,
+        worker_init: Optional[Callable[[int], None]] = None,
+    ):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.num_workers = num_workers
+        self.worker_init = worker_init
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+    def _submit(self, item: Any) -> Future:
+        self._ensure_started()
+        request = _Request(item)
+        self._queue.put(request)
+        return request.future
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if not self._threads:
+                self._threads = [
+                    threading.Thread(
+                        target=self._loop,
+                        args=(i,),
+                        name=f"{self.thread_name}-{i}",
+                        daemon=True,
+                    )
+                    for i in range(self.num_workers)
+                ]
+                for thread in self._threads:
+                    thread.start()
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self, index: int) -> None:
+        if self.worker_init is not None:
+            self.worker_init(index)
+        while True:
+            self._run(self._collect())
+
+    def _run_batch(self, items: List[Any]) -> List[Any]:
+        raise NotImplementedError
+
+    def _run(self, batch: List[_Request]) -> None:
+        try:
+            results = self._run_batch([request.item for request in batch])
+        except Exception as e:
+            logging.exception(f"{type(self).__name__} batch of {len(batch)} failed")
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        for request, result in zip(batch, results):
+            request.future.set_result(result)
+
+
+class InferenceBatcher(_Batcher):
+    """Groups concurrent TSR forwards into one batched call.
+
+    The collected images run through the image tokenizer and backbone
+    together, and each caller gets its own slice of the batched scene codes
+    back. One worker per CPU replica runs several batches at once.
+    """
+
+    thread_name = "inference-batcher"
+
+    def __init__(self, model_registry: ModelRegistry, **kwargs):
+        super().__init__(**kwargs)
+        self.model_registry = model_registry
+
+    def submit(self, image: PIL.Image.Image) -> "Future[torch.Tensor]":
+        return self._submit(image)
+
+    def __call__(self, image: PIL.Image.Image) -> "torch.Tensor":
+        return self.submit(image).result()
+
+    def _run_batch(self, images: List[PIL.Image.Image]) -> List["torch.Tensor"]:
+        import torch
+
+        model = self.model_registry.get()
+        with torch.no_grad():
+            scene_codes = model(images, device=self.model_registry.device)
+        logging.info(f"Ran batched inference on {len(images)} images")
+        return [scene_codes[i : i + 1] for i in range(len(images))]
+
+
+class PreprocessBatcher(_Batcher):
+    """Groups concurrent background removals into one rembg call.
+
+    `preprocess(images, foreground_ratios)` removes the backgrounds of the
+    collected images in one U^2-Net batch and composites each over gray, e.g.
+    `CpuPool.preprocess_images`.
+    """
+
+    thread_name = "preprocess-batcher"
+
+    def __init__(
+        self,
+        preprocess: Callable[
+            [List[PIL.Image.Image], List[float]], List[PIL.Image.Image]
+        ],
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self.preprocess = preprocess
+
+    def submit(
+        self, image: PIL.Image.Image, foreground_ratio: float
+    ) -> "Future[PIL.Image.Image]":
+        return self._submit((image, foreground_ratio))
+
+    def __call__(
+        self, image: PIL.Image.Image, foreground_ratio: float
+    ) -> PIL.Image.Image:
+        return self.submit(image, foreground_ratio).result()
+
+    def _run_batch(
+        self, items: List[Tuple[PIL.Image.Image, float]]
+    ) -> List[PIL.Image.Image]:
+        images, foreground_ratios = zip(*items)
+        return self.preprocess(list(images), list(foreground_ratios))
@@ -0,0 +1,100 @@
+"""Per-block latency of the backbone attention with and without fused projections.
+
+Times one TSR attention block for self-attention over the triplane tokens and
+cross-attention to the image tokens, with separate to_q/to_k/to_v matmuls and
+with the fused to_qkv/to_kv ones, and checks that both give the same output:
+
+    python benchmarks/bench_attention.py --device cuda:0 --batch-size 1 4
+
+Defaults match stabilityai/TripoSR (1024-d triplane tokens, 16 heads of 64,
+768-d DINO tokens).
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+
+from tsr.models.transformer.attention import Attention
+
+
+def synchronize(device):
+    if device.startswith("cuda"):
+        torch.cuda.synchronize()
+
+
+def time_block(attn, hidden_states, encoder_hidden_states, device, repeats, warmup):
+    with torch.no_grad():
+        for _ in range(warmup):
+            attn(hidden_states, encoder_hidden_states=encoder_hidden_states)
+        synchronize(device)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            output = attn(hidden_states, encoder_hidden_states=encoder_hidden_states)
+        synchronize(device)
+    return (time.perf_counter() - start) / repeats * 1000.0, output
+
+
+def bench(kind, args, batch_size, dtype):
+    cross = kind == "cross"
+    attn = Attention(
+        query_dim=args.dim,
+        cross_attention_dim=args.cross_attention_dim if cross else None,
+        heads=args.heads,
+        dim_head=args.dim // args.heads,
+        bias=args.bias,
+    ).to(args.device, dtype).eval()
+    hidden_states = torch.randn(batch_size, args.tokens, args.dim, device=args.device, dtype=dtype)
+    encoder_hidden_states = (
+        torch.randn(batch_size, args.cross_tokens, args.cross_attention_dim, device=args.device, dtype=dtype)
+        if cross
+        else None
+    )
+
+    separate_ms, expected = time_block(attn, hidden_states, encoder_hidden_states, args.device, args.repeats, args.warmup)
+    attn.fuse_projections()
+    fused_ms, output = time_block(attn, hidden_states, encoder_hidden_states, args.device, args.repeats, args.warmup)
+    return {
+        "attention": kind,
+        "batch_size": batch_size,
+        "separate_ms": separate_ms,
+        "fused_ms": fused_ms,
+        "speedup": separate_ms / fused_ms,
+        "max_abs_diff": (output - expected).abs().max().item(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--device", type=str, default="cuda:0")
+    parser.add_argument("--dtype", type=str, default="float32", choices=["float32", "float16", "bfloat16"])
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--heads", type=int, default=16)
+    parser.add_argument("--tokens", type=int, default=3 * 32 * 32, help="Triplane tokens (3 planes of 32x32).")
+    parser.add_argument("--cross-attention-dim", type=int, default=768)
+    parser.add_argument("--cross-tokens", type=int, default=1025, help="Image tokens (16x16 patches of 512px plus CLS).")
+    parser.add_argument("--bias", action="store_true")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    args = parser.parse_args()
+    if not torch.cuda.is_available():
+        args.device = "cpu"
+
+    dtype = getattr(torch, args.dtype)
+    torch.manual_seed(0)
+    results = [
+        bench(kind, args, batch_size, dtype)
+        for kind in ("self", "cross")
+        for batch_size in args.batch_size
+    ]
+    print(json.dumps({"device": args.device, "dtype": args.dtype, "results": results}, indent=4))
+
+
+if __name__ == "__main__":
+    main()
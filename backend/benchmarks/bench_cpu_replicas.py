@@ -0,0 +1,89 @@
+"""Size CPU serving: throughput for each replica count on this host.
+
+Runs bench_pipeline.py on the CPU once per replica count, each in a fresh
+process because the thread settings are read at startup, and reports jobs
+per minute and latency so TSR_CPU_REPLICAS can be chosen per node type:
+
+    python benchmarks/bench_cpu_replicas.py --replicas 1 2 4 --affinity auto \\
+        --output cpu-replicas.json
+
+Extra arguments after `--` are passed through to bench_pipeline.py.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BENCH_PIPELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_pipeline.py")
+
+
+def run(replicas, args, passthrough):
+    with tempfile.NamedTemporaryFile(suffix=".json") as output:
+        env = dict(
+            os.environ,
+            TSR_CPU_REPLICAS=str(replicas),
+            TSR_CPU_AFFINITY=args.affinity,
+            # as many jobs in flight as replicas can serve, and no more
+            TSR_MAX_BATCH_SIZE=str(args.max_batch_size),
+        )
+        command = [
+            sys.executable,
+            BENCH_PIPELINE,
+            "--device", "cpu",
+            "--concurrency", str(replicas * args.max_batch_size),
+            "--jobs", str(args.jobs),
+            "--mc-resolution", str(args.mc_resolution),
+            "--output", output.name,
+            *passthrough,
+        ]
+        returncode = subprocess.call(command, env=env)
+        # a run with failed jobs exits non-zero but still writes its report
+        if returncode and not os.path.getsize(output.name):
+            raise subprocess.CalledProcessError(returncode, command)
+        with open(output.name) as f:
+            report = json.load(f)
+    result = report["results"][0]
+    return {
+        "replicas": replicas,
+        "jobs_per_minute": result["jobs_per_minute"],
+        "latency_ms": result["latency_ms"],
+        "failed": result["failed"],
+    }
+
+
+def main():
+    argv = sys.argv[1:]
+    passthrough = []
+    if "--" in argv:
+        passthrough = argv[argv.index("--") + 1 :]
+        argv = argv[: argv.index("--")]
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--replicas", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--affinity", type=str, default="auto", help='TSR_CPU_AFFINITY for every run; "" disables pinning.')
+    parser.add_argument("--max-batch-size", type=int, default=1)
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--mc-resolution", type=int, default=128)
+    parser.add_argument("--output", type=str, default=None)
+    args = parser.parse_args(argv)
+
+    results = []
+    for replicas in args.replicas:
+        print(f"Running with {replicas} CPU replicas", file=sys.stderr)
+        results.append(run(replicas, args, passthrough))
+    best = max(results, key=lambda r: r["jobs_per_minute"])
+
+    output = json.dumps({"best_replicas": best["replicas"], "results": results}, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    if any(result["failed"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
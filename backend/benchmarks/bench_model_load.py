@@ -0,0 +1,60 @@
+"""Time and peak memory of loading TSR from each weight format.
+
+Loads the model once per weight file, each in a fresh interpreter so peak RSS
+isn't shared between runs, and reports load seconds and peak RSS. Convert the
+checkpoint first with `python -m tsr.weights <model dir>/model.ckpt`:
+
+    python benchmarks/bench_model_load.py --model /models/TripoSR \\
+        --weights model.ckpt model.safetensors
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child. find_weights is patched out so model.ckpt isn't swapped
+# for the converted file next to it.
+PROBE = """
+import json, resource, sys, time
+import tsr.system
+from tsr.system import TSR
+
+tsr.system.find_weights = lambda path: path
+start = time.perf_counter()
+model = TSR.from_pretrained(sys.argv[1], config_name="config.yaml", weight_name=sys.argv[2])
+seconds = time.perf_counter() - start
+print(json.dumps({
+    "seconds": seconds,
+    # kilobytes on Linux
+    "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+}))
+"""
+
+
+def run(model_dir, weight_name):
+    output = subprocess.check_output(
+        [sys.executable, "-c", PROBE, model_dir, weight_name], cwd=BACKEND_DIR
+    )
+    return {"weights": weight_name, **json.loads(output.decode().splitlines()[-1])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--model", type=str, required=True, help="Local TSR model directory.")
+    parser.add_argument("--weights", type=str, nargs="+", default=["model.ckpt", "model.safetensors"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    for weight_name in args.weights:
+        runs = [run(os.path.abspath(args.model), weight_name) for _ in range(args.repeat)]
+        results.append(min(runs, key=lambda r: r["seconds"]))
+    print(json.dumps({"results": results}, indent=4))
+
+
+if __name__ == "__main__":
+    main()
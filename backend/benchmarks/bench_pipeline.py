@@ -0,0 +1,263 @@
+"""End-to-end throughput and latency benchmark for the generation pipeline.
+
+Drives /process through Flask's test client with the offline provider and the
+filesystem object store, using a randomly initialized TSR built from a local
+config (or a local model directory), and sweeps the generation parameters.
+Results are written as JSON so runs can be compared across commits:
+
+    python benchmarks/bench_pipeline.py --concurrency 1 4 --mc-resolution 128 256 \\
+        --output bench.json
+
+rembg needs its u2net model cached locally (see U2NET_HOME), and
+--bake-texture 1 needs a moderngl-capable OpenGL context.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import torch
+from omegaconf import OmegaConf
+from PIL import Image
+
+from tsr.system import TSR
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(__file__), "configs", "tsr-tiny.yaml")
+DEFAULT_IMAGE = os.path.join(BACKEND_DIR, "examples", "tree.webp")
+
+
+def build_random_model(config_path, out_dir, seed=0, threshold=25.0, image_path=DEFAULT_IMAGE):
+    cfg = OmegaConf.load(config_path)
+    tokenizer_path = os.path.join(
+        os.path.dirname(os.path.abspath(config_path)),
+        cfg.image_tokenizer.pretrained_model_name_or_path,
+    )
+    if os.path.isdir(tokenizer_path):
+        cfg.image_tokenizer.pretrained_model_name_or_path = tokenizer_path
+    OmegaConf.resolve(cfg)
+
+    torch.manual_seed(seed)
+    model = TSR(cfg)
+    model.eval()
+    # Shift the density so the random field crosses the marching cubes level;
+    # otherwise every mesh is empty and the later stages measure nothing.
+    # The shift puts the median density of the offline provider's example
+    # image at the threshold, so about half the volume is occupied.
+    if cfg.renderer.density_activation in ("exp", "trunc_exp"):
+        radius = cfg.renderer.radius
+        with torch.no_grad():
+            scene_codes = model([Image.open(image_path).convert("RGB")], device="cpu")
+            positions = torch.rand(4096, 3) * 2 * radius - radius
+            density = model.renderer.query_triplane(
+                model.decoder, positions, scene_codes[0]
+            )["density"]
+            model.decoder.layers[-1].bias[0] += (
+                math.log(threshold) - cfg.renderer.density_bias - density.median()
+            )
+
+    os.makedirs(out_dir, exist_ok=True)
+    OmegaConf.save(cfg, os.path.join(out_dir, "config.yaml"))
+    torch.save(model.state_dict(), os.path.join(out_dir, "model.ckpt"))
+    return out_dir
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * q / 100.0
+    lo = math.floor(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+
+def sweep(args):
+    for concurrency, mc_resolution, chunk_size, bake_texture in itertools.product(
+        args.concurrency, args.mc_resolution, args.chunk_size, args.bake_texture
+    ):
+        # the texture resolution only matters when a texture is baked
+        for texture_resolution in args.texture_resolution if bake_texture else [None]:
+            yield {
+                "concurrency": concurrency,
+                "mc_resolution": mc_resolution,
+                "chunk_size": chunk_size,
+                "bake_texture": bool(bake_texture),
+                "texture_resolution": texture_resolution or args.texture_resolution[0],
+            }
+
+
+def run_job(app, text, params, poll_interval):
+    client = app.test_client()
+    while True:
+        response = client.post("/process", json={"text": text, **params})
+        if response.status_code not in (429, 503):
+            break
+        time.sleep(float(response.headers.get("Retry-After", poll_interval)))
+    job_id = response.get_json()["job_id"]
+    while True:
+        job = client.get(f"/jobs/{job_id}").get_json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(poll_interval)
+
+
+def run_config(main, config, n_jobs, poll_interval):
+    import metrics
+
+    main.model_registry.get().renderer.set_chunk_size(config["chunk_size"])
+    metrics.STAGE_PEAK_RSS.clear()
+    metrics.STAGE_PEAK_CUDA_MEMORY.clear()
+
+    params = {
+        "mc_resolution": config["mc_resolution"],
+        "bake_texture": config["bake_texture"],
+        "texture_resolution": config["texture_resolution"],
+    }
+    # random prompts, far enough apart that neither the asset cache nor the
+    # plant index's fuzzy name matching short-circuits a job
+    texts = [f"benchmark plant {uuid.uuid4().hex}" for _ in range(n_jobs)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=config["concurrency"]) as pool:
+        jobs = list(
+            pool.map(lambda t: run_job(main.app, t, params, poll_interval), texts)
+        )
+    elapsed = time.perf_counter() - start
+
+    succeeded = [job for job in jobs if job["status"] == "succeeded"]
+    stages = {}
+    for job in succeeded:
+        for stage in job["stages"]:
+            if stage["duration_ms"] is not None:
+                stages.setdefault(stage["name"], []).append(stage["duration_ms"])
+
+    return {
+        "config": config,
+        "jobs": len(jobs),
+        "failed": len(jobs) - len(succeeded),
+        "errors": sorted({job["error"] for job in jobs if job["error"]}),
+        "elapsed_s": elapsed,
+        "jobs_per_minute": len(succeeded) / elapsed * 60.0,
+        "latency_ms": summarize(
+            [(job["finished_at"] - job["created_at"]) * 1000.0 for job in succeeded]
+        ),
+        "stage_latency_ms": {name: summarize(v) for name, v in stages.items()},
+        "stage_peak_rss_bytes": {
+            k[0]: v for k, v in metrics.STAGE_PEAK_RSS.snapshot().items()
+        },
+        "stage_peak_cuda_memory_bytes": {
+            k[0]: v for k, v in metrics.STAGE_PEAK_CUDA_MEMORY.snapshot().items()
+        },
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--model", type=str, default=None, help="Local TSR model directory. A random model is built from --config if not given.")
+    parser.add_argument("--config", type=str, default=DEFAULT_CONFIG, help="TSR config used to build the random model.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--mc-resolution", type=int, nargs="+", default=[128, 256])
+    parser.add_argument("--chunk-size", type=int, nargs="+", default=[8192])
+    parser.add_argument("--bake-texture", type=int, nargs="+", default=[0], choices=[0, 1])
+    parser.add_argument("--texture-resolution", type=int, nargs="+", default=[1024])
+    parser.add_argument("--jobs", type=int, default=8, help="Jobs per configuration.")
+    parser.add_argument("--device", type=str, default="cuda:0")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--output", type=str, default=None, help="Write JSON here instead of stdout.")
+    args = parser.parse_args()
+
+    output_path = os.path.abspath(args.output) if args.output else None
+    workdir = tempfile.mkdtemp(prefix="greenspace-bench-")
+    model_dir = args.model or build_random_model(
+        args.config, os.path.join(workdir, "model")
+    )
+
+    # main.py reads its configuration from the environment at import time
+    os.environ.update(
+        {
+            "GREENSPACE_OFFLINE": "1",
+            "OBJECT_STORE_DIR": os.path.join(workdir, "object_store"),
+            "ASSET_CACHE_INDEX": os.path.join(workdir, "cache", "assets.json"),
+            "PLANT_INDEX": os.path.join(workdir, "cache", "plants.json"),
+            # every offline job gets the same image, so a scene store would
+            # skip preprocessing and the TSR forward for all but the first
+            "SCENE_STORE_DIR": "",
+            "PERSIST_ASSETS": "0",
+            "TSR_MODEL": os.path.abspath(model_dir),
+            "TSR_DEVICE": args.device,
+            "PIPELINE_WORKERS": str(max(args.concurrency)),
+        }
+    )
+    os.chdir(workdir)
+    import main as server
+
+    server.model_registry.get()
+
+    results = []
+    for config in sweep(args):
+        print(f"Running {config}", file=sys.stderr)
+        results.append(
+            run_config(server, config, args.jobs, args.poll_interval)
+        )
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "host": {
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "torch": torch.__version__,
+            "device": server.model_registry.device,
+        },
+        # precision and compile status/time, e.g. with TSR_COMPILE set
+        "model_registry": server.model_registry.health(),
+        "model": args.model or os.path.abspath(args.config),
+        "results": results,
+    }
+    output = json.dumps(report, indent=4)
+    if output_path:
+        with open(output_path, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    # a configuration whose jobs fail measures nothing; don't let it pass
+    failed = sum(result["failed"] for result in results)
+    if failed:
+        print(f"{failed} benchmark jobs failed", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
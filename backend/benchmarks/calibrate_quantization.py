@@ -0,0 +1,115 @@
+"""Calibrate dynamic int8 quantization for CPU serving and write the artifact.
+
+Runs the same images through the fp32 model and through a second copy with
+the linear layers of the given modules quantized to int8, compares the extracted
+meshes with tsr.mesh_metrics (Chamfer distance, vertex color error), and
+reports CPU latency and serialized weight size of both. The quantized model
+is only saved when it is within the tolerances:
+
+    python benchmarks/calibrate_quantization.py --model /models/TripoSR \\
+        --output /models/TripoSR/model-int8.pt --max-chamfer 0.005
+
+then serve it with TSR_QUANTIZATION=int8 TSR_QUANTIZED_WEIGHTS=<output>.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import torch
+from PIL import Image
+
+from bench_pipeline import DEFAULT_CONFIG, build_random_model
+from tsr.mesh_metrics import check_meshes
+from tsr.quantization import QUANTIZED_MODULES, quantize_dynamic_int8, save_quantized
+from tsr.system import TSR
+
+DEFAULT_IMAGES = [os.path.join(BACKEND_DIR, "examples", "tree.webp")]
+
+
+def serialized_size(model):
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+
+def load_model(model_dir, chunk_size):
+    model = TSR.from_pretrained(model_dir, config_name="config.yaml", weight_name="model.ckpt")
+    model.renderer.set_chunk_size(chunk_size)
+    model.eval()
+    return model
+
+
+def run(model, images, mc_resolution, repeats):
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with torch.no_grad():
+            scene_codes = model(images, device="cpu")
+        meshes = model.extract_mesh(scene_codes, True, resolution=mc_resolution)
+        seconds.append(time.perf_counter() - start)
+    return meshes, {"seconds": min(seconds), "weight_bytes": serialized_size(model)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--model", type=str, default=None, help="Local TSR model directory. A random model is built from --config if not given.")
+    parser.add_argument("--config", type=str, default=DEFAULT_CONFIG)
+    parser.add_argument("--images", type=str, nargs="+", default=DEFAULT_IMAGES)
+    parser.add_argument("--modules", type=str, nargs="+", default=list(QUANTIZED_MODULES))
+    parser.add_argument("--mc-resolution", type=int, default=256)
+    parser.add_argument("--chunk-size", type=int, default=8192)
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per model; the fastest is reported.")
+    parser.add_argument("--max-chamfer", type=float, default=0.005, help="Relative to the bounding box diagonal.")
+    parser.add_argument("--min-f-score", type=float, default=0.95)
+    parser.add_argument("--max-color-error", type=float, default=0.05)
+    parser.add_argument("--output", type=str, default=None, help="Write the quantized model here if it passes.")
+    args = parser.parse_args()
+
+    model_dir = args.model or build_random_model(
+        args.config, os.path.join(tempfile.mkdtemp(prefix="greenspace-int8-"), "model")
+    )
+    # loaded twice rather than deep-copied: TSR holds a lock, which can't be copied
+    model = load_model(model_dir, args.chunk_size)
+    quantized = quantize_dynamic_int8(load_model(model_dir, args.chunk_size), args.modules)
+    images = [Image.open(path).convert("RGB") for path in args.images]
+
+    reference, reference_stats = run(model, images, args.mc_resolution, args.repeats)
+    meshes, stats = run(quantized, images, args.mc_resolution, args.repeats)
+    report = {
+        "modules": args.modules,
+        "fp32": reference_stats,
+        "int8": stats,
+        "speedup": reference_stats["seconds"] / stats["seconds"],
+        "results": [],
+    }
+    failures = []
+    for path, ref_mesh, mesh in zip(args.images, reference, meshes):
+        metrics, mesh_failures = check_meshes(
+            ref_mesh,
+            mesh,
+            max_chamfer=args.max_chamfer,
+            min_f_score=args.min_f_score,
+            max_color_error=args.max_color_error,
+        )
+        report["results"].append({"image": path, **metrics})
+        failures.extend(f"{path}: {failure}" for failure in mesh_failures)
+
+    print(json.dumps(report, indent=4))
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    if args.output and not failures:
+        save_quantized(quantized, args.output)
+        print(f"Saved quantized model to {args.output}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Check that lower inference precision keeps extracted meshes accurate.
+
+Runs the same images through TSR in fp32 and in each requested precision,
+extracts meshes and compares them with tsr.mesh_metrics, alongside the
+inference time and peak CUDA memory of each mode. Exits non-zero when a
+precision exceeds the tolerances, so TSR_PRECISION is only lowered after:
+
+    python benchmarks/check_precision.py --model /models/TripoSR --device cuda:0 \\
+        --precision fp16 --max-chamfer 0.002 --min-f-score 0.98
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import torch
+from PIL import Image
+
+from bench_pipeline import DEFAULT_CONFIG, build_random_model
+from tsr.mesh_metrics import check_meshes
+from tsr.system import TSR
+
+DEFAULT_IMAGES = [os.path.join(BACKEND_DIR, "examples", "tree.webp")]
+
+
+def run(model, images, device, precision, mc_resolution):
+    model.set_precision(precision, device)
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+    start = time.perf_counter()
+    with torch.no_grad():
+        scene_codes = model(images, device=device)
+    meshes = model.extract_mesh(scene_codes, True, resolution=mc_resolution)
+    if torch.cuda.is_available():
+        torch.cuda.synchronize()
+    return meshes, {
+        "seconds": time.perf_counter() - start,
+        "peak_cuda_memory_bytes": (
+            torch.cuda.max_memory_allocated() if torch.cuda.is_available() else None
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--model", type=str, default=None, help="Local TSR model directory. A random model is built from --config if not given.")
+    parser.add_argument("--config", type=str, default=DEFAULT_CONFIG)
+    parser.add_argument("--images", type=str, nargs="+", default=DEFAULT_IMAGES)
+    parser.add_argument("--device", type=str, default="cuda:0")
+    parser.add_argument("--precision", type=str, nargs="+", default=["auto"])
+    parser.add_argument("--mc-resolution", type=int, default=256)
+    parser.add_argument("--max-chamfer", type=float, default=0.005, help="Relative to the bounding box diagonal.")
+    parser.add_argument("--min-f-score", type=float, default=0.95)
+    parser.add_argument("--max-color-error", type=float, default=0.05)
+    args = parser.parse_args()
+
+    device = args.device if torch.cuda.is_available() else "cpu"
+    model_dir = args.model or build_random_model(
+        args.config, os.path.join(tempfile.mkdtemp(prefix="greenspace-precision-"), "model")
+    )
+    model = TSR.from_pretrained(model_dir, config_name="config.yaml", weight_name="model.ckpt")
+    model.to(device)
+    model.eval()
+    images = [Image.open(path).convert("RGB") for path in args.images]
+
+    reference, reference_stats = run(model, images, device, "fp32", args.mc_resolution)
+    report = {"device": device, "fp32": reference_stats, "results": []}
+    failures = []
+    for requested in args.precision:
+        precision = model.set_precision(requested, device)
+        meshes, stats = run(model, images, device, precision, args.mc_resolution)
+        for path, ref_mesh, mesh in zip(args.images, reference, meshes):
+            metrics, mesh_failures = check_meshes(
+                ref_mesh,
+                mesh,
+                max_chamfer=args.max_chamfer,
+                min_f_score=args.min_f_score,
+                max_color_error=args.max_color_error,
+            )
+            report["results"].append(
+                {"precision": precision, "image": path, **stats, **metrics}
+            )
+            failures.extend(f"{precision} {path}: {failure}" for failure in mesh_failures)
+
+    print(json.dumps(report, indent=4))
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Check that the server module imports within a time budget.
+
+Workers must start serving /healthz quickly after a scale-up, so `import main`
+must not pull in torch, tsr, rembg, xatlas, moderngl, imageio, openai or boto3
+on the import path; those load on the model loader thread or on first use.
+Each run imports main in a fresh interpreter, both offline (local provider,
+filesystem object store) and online (OpenAI provider, boto3 S3 client; no
+requests are made, so no credentials are needed), and the check exits
+non-zero when the fastest run of a mode is over budget or a heavy module was
+imported synchronously:
+
+    python benchmarks/import_budget.py --budget-ms 1500 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = [
+    "torch",
+    "tsr.system",
+    "transformers",
+    "trimesh",
+    "rembg",
+    "onnxruntime",
+    "xatlas",
+    "moderngl",
+    "imageio",
+    "openai",
+    "boto3",
+]
+
+# Runs in the child. The model registry and rembg pool import torch and rembg
+# on their own threads as soon as main is imported; threading.Thread.start is
+# patched out so those loaders don't show up in the module check.
+PROBE = """
+import json, sys, threading, time
+threading.Thread.start = lambda self: None
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+client = main.app.test_client()
+healthz = client.get("/healthz").status_code
+print(json.dumps({
+    "import_ms": elapsed * 1000.0,
+    "healthz": healthz,
+    "modules": sorted(m for m in %r if m in sys.modules),
+}))
+"""
+
+
+MODES = {
+    "offline": lambda workdir: {
+        "GREENSPACE_OFFLINE": "1",
+        "OBJECT_STORE_DIR": os.path.join(workdir, "object_store"),
+    },
+    # set, not just left out, so a .env file can't switch the mode
+    "online": lambda workdir: {
+        "GREENSPACE_OFFLINE": "0",
+        "GREENSPACE_PROVIDER": "openai",
+        "OBJECT_STORE_DIR": "",
+    },
+}
+
+
+def probe(workdir, mode):
+    env = dict(
+        os.environ,
+        **MODES[mode](workdir),
+        ASSET_CACHE_INDEX=os.path.join(workdir, "cache", "assets.json"),
+        PYTHONPATH=BACKEND_DIR,
+    )
+    output = subprocess.check_output(
+        [sys.executable, "-c", PROBE % (HEAVY_MODULES,)],
+        cwd=workdir,
+        env=env,
+        text=True,
+    )
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1500")))
+    parser.add_argument("--repeat", type=int, default=3, help="Imports to run per mode; the fastest one is checked.")
+    parser.add_argument("--modes", type=str, nargs="+", default=list(MODES), choices=list(MODES))
+    args = parser.parse_args()
+
+    report = {"budget_ms": args.budget_ms, "modes": {}}
+    failures = []
+    for mode in args.modes:
+        workdir = tempfile.mkdtemp(prefix="greenspace-import-")
+        runs = [probe(workdir, mode) for _ in range(args.repeat)]
+        best = min(run["import_ms"] for run in runs)
+        heavy = sorted({m for run in runs for m in run["modules"]})
+        report["modes"][mode] = {"best_ms": best, "runs": runs}
+
+        if best > args.budget_ms:
+            failures.append(f"{mode}: import main took {best:.0f}ms, budget is {args.budget_ms:.0f}ms")
+        if heavy:
+            failures.append(f"{mode}: imported on the startup path: {', '.join(heavy)}")
+        if any(run["healthz"] != 200 for run in runs):
+            failures.append(f"{mode}: /healthz did not return 200")
+
+    print(json.dumps(report, indent=4))
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
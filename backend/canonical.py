@@ -0,0 +1,144 @@
+import difflib
+import json
+import logging
+import os
+import threading
+from typing import Dict, Iterable, Optional
+
+from asset_cache import normalize_plant_name
+
+# words that don't tell plants apart: "apple", "apple tree" and "an apple
+# tree" are the same request
+FILLER_WORDS = {"a", "an", "the", "tree", "trees", "plant", "plants"}
+
+
+def canonical_key(name: str) -> str:
+    words = []
+    for word in normalize_plant_name(name).split():
+        if word in FILLER_WORDS:
+            continue
+        # naive singular, applied the same way to both sides of a lookup
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return " ".join(words) or normalize_plant_name(name)
+
+
+def _close_words(a: str, b: str, cutoff: float) -> bool:
+    # word by word, so "benchmark 0 1" and "benchmark 0 0" or "wet climate"
+    # and "dry climate" stay apart while "grandflora" still finds "grandiflora"
+    a_words, b_words = a.split(), b.split()
+    return len(a_words) == len(b_words) and all(
+        difflib.SequenceMatcher(None, x, y).ratio() >= cutoff
+        for x, y in zip(a_words, b_words)
+    )
+
+
+class PlantIndex:
+    """Maps free-text plant queries to plants that were already generated.
+
+    Every generated plant is recorded under its canonical name, its
+    scientific name and the prompts that led to it. A query is matched by
+    normalized key first; only plant and scientific names are also matched
+    fuzzily, word by word, to catch spelling variants. Prompts are free text,
+    where one changed word can mean another plant, so they only ever match
+    exactly. "apple tree", "Apple Trees" and "Malus domestica" all resolve
+    to the same plant and its stored assets. The index is persisted as JSON
+    so it survives restarts.
+    """
+
+    def __init__(
+        self,
+        index_path: str = "cache/plants.json",
+        cutoff: float = 0.9,
+        min_fuzzy_length: int = 5,
+    ):
+        self.index_path = index_path
+        self.cutoff = cutoff
+        self.min_fuzzy_length = min_fuzzy_length
+        # canonical key of a plant or scientific name -> canonical plant name
+        self._names: Dict[str, str] = {}
+        # canonical key of a prompt -> canonical plant name, exact matches only
+        self._aliases: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def lookup(self, query: str) -> Optional[str]:
+        key = canonical_key(query)
+        if not key:
+            return None
+        with self._lock:
+            if key in self._names:
+                return self._names[key]
+            if key in self._aliases:
+                return self._aliases[key]
+            if len(key) < self.min_fuzzy_length:
+                return None
+            matches = [
+                match
+                for match in difflib.get_close_matches(
+                    key, list(self._names), n=3, cutoff=self.cutoff
+                )
+                if _close_words(key, match, self.cutoff)
+            ]
+            if not matches:
+                return None
+            logging.info(f"Matched plant query {query!r} to {matches[0]!r}")
+            return self._names[matches[0]]
+
+    def add(
+        self,
+        plant_name: str,
+        scientific_name: Optional[str] = None,
+        aliases: Iterable[str] = (),
+    ) -> str:
+        """Record a generated plant and return its canonical name.
+
+        If the name itself matches a known plant (e.g. GPT returned "Apple
+        tree" for a plant first stored as "Apple Tree"), that plant stays
+        canonical and the new name is recorded for it. `aliases` are the
+        prompts that led to the plant.
+        """
+        canonical = self.lookup(plant_name) or plant_name
+        with self._lock:
+            changed = False
+            for table, names in (
+                (self._names, [plant_name, scientific_name]),
+                (self._aliases, aliases),
+            ):
+                for name in names:
+                    key = canonical_key(name or "")
+                    if key and key not in table:
+                        table[key] = canonical
+                        changed = True
+            if changed:
+                self._save()
+        return canonical
+
+    def __len__(self) -> int:
+        return len(set(self._names.values()) | set(self._aliases.values()))
+
+    def _load(self) -> None:
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path) as f:
+                data = json.load(f)
+            names, aliases = dict(data["names"]), dict(data["aliases"])
+        except (OSError, ValueError, KeyError, TypeError):
+            logging.warning(f"Ignoring unreadable plant index {self.index_path}")
+            return
+        self._names = names
+        self._aliases = aliases
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {"names": self._names, "aliases": self._aliases},
+                f,
+                indent=4,
+                sort_keys=True,
+            )
+        os.replace(tmp_path, self.index_path)
@@ -0,0 +1,288 @@
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import PIL.Image
+from PIL import Image
+
+# (shared memory name, shape, dtype) - all that crosses the process boundary
+ArraySpec = Tuple[str, Tuple[int, ...], str]
+
+
+# Spawned workers share the parent's resource tracker, so a segment is
+# registered once however many processes map it. Whoever reads the final
+# copy unlinks it: the parent for both its inputs and the workers' results.
+
+
+def _share(array: np.ndarray):
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def _take(spec: ArraySpec) -> np.ndarray:
+    """Copy a worker's result out of shared memory and free the segment."""
+    shm = shared_memory.SharedMemory(name=spec[0])
+    try:
+        return np.ndarray(spec[1], np.dtype(spec[2]), buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+# ---- worker side ----
+
+_rembg_model = "u2net"
+_rembg_session: Any = None
+_num_threads = 1
+
+
+def _init_worker(rembg_model: str, num_threads: int) -> None:
+    global _rembg_model, _num_threads
+    _rembg_model = rembg_model
+    _num_threads = num_threads
+    # the pool itself is the parallelism; don't let every worker also start
+    # a full-size OpenMP pool. The variables only reach libraries that
+    # haven't started their thread pools yet, so torch is also told directly
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(num_threads)
+    if "torch" in sys.modules:
+        _set_torch_threads()
+
+
+def _set_torch_threads() -> None:
+    import torch
+
+    if torch.get_num_threads() != _num_threads:
+        torch.set_num_threads(_num_threads)
+
+
+def _run(
+    task: Callable[..., Dict[str, np.ndarray]],
+    specs: Sequence[Optional[ArraySpec]],
+    *args,
+) -> Dict[str, ArraySpec]:
+    handles = [
+        None if spec is None else shared_memory.SharedMemory(name=spec[0])
+        for spec in specs
+    ]
+    try:
+        arrays = [
+            None if shm is None else np.ndarray(spec[1], np.dtype(spec[2]), buffer=shm.buf)
+            for shm, spec in zip(handles, specs)
+        ]
+        outputs = task(*arrays, *args)
+        del arrays
+        results = {}
+        for name, array in outputs.items():
+            shm, results[name] = _share(array)
+            shm.close()
+        return results
+    finally:
+        for shm in handles:
+            if shm is not None:
+                try:
+                    shm.close()
+                except BufferError:
+                    # a traceback still holds a view; the mapping goes with it
+                    pass
+
+
+def _warmup_task() -> int:
+    _get_rembg_session()
+    return os.getpid()
+
+
+def _get_rembg_session() -> Any:
+    global _rembg_session
+    if _rembg_session is None:
+        import rembg
+
+        _rembg_session = rembg.new_session(_rembg_model)
+    return _rembg_session
+
+
+def _preprocess_task(*images_and_ratios):
+    from tsr.utils import remove_background_batch
+
+    *images, foreground_ratios = images_and_ratios
+    images = remove_background_batch(
+        [Image.fromarray(image) for image in images], _get_rembg_session()
+    )
+    return {
+        f"image{i}": np.asarray(composite_foreground(image, foreground_ratio))
+        for i, (image, foreground_ratio) in enumerate(zip(images, foreground_ratios))
+    }
+
+
+def _marching_cubes_task(level: np.ndarray, isovalue: float):
+    import torch
+    from torchmcubes import marching_cubes
+
+    _set_torch_threads()
+    v_pos, t_pos_idx = marching_cubes(torch.from_numpy(level), isovalue)
+    return {"v_pos": v_pos.numpy(), "t_pos_idx": t_pos_idx.numpy()}
+
+
+def _make_atlas_task(vertices, faces, texture_resolution, texture_padding):
+    from tsr.bake_texture import make_atlas
+
+    mesh = SimpleNamespace(vertices=vertices, faces=faces)
+    return make_atlas(mesh, texture_resolution, texture_padding)
+
+
+def _export_mesh_task(vertices, faces, vertex_colors, file_type):
+    import trimesh
+
+    # process=False: the parent already merged vertices, keep them as they are
+    mesh = trimesh.Trimesh(
+        vertices=vertices, faces=faces, vertex_colors=vertex_colors, process=False
+    )
+    data = mesh.export(file_type=file_type)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return {"data": np.frombuffer(data, dtype=np.uint8)}
+
+
+def composite_foreground(
+    image: PIL.Image.Image, foreground_ratio: float
+) -> PIL.Image.Image:
+    """Center and scale a background-removed RGBA image over 50% gray."""
+    from tsr.utils import resize_foreground
+
+    image = resize_foreground(image, foreground_ratio)
+    image = np.array(image).astype(np.float32) / 255.0
+    image = image[:, :, :3] * image[:, :, 3:4] + (1 - image[:, :, 3:4]) * 0.5
+    return Image.fromarray((image * 255.0).astype(np.uint8))
+
+
+# ---- parent side ----
+
+
+class CpuPool:
+    """Runs the CPU-bound pipeline stages in worker processes.
+
+    rembg, the torchmcubes CPU fallback, xatlas charting and trimesh export
+    all hold the GIL or run single-threaded, so they cap a single process at
+    roughly one core no matter how many job threads are running. Here they
+    run in a spawn-started process pool instead, and images, density grids
+    and meshes move through shared memory: the parent copies inputs into a
+    segment, the worker maps it, and results come back the same way. Only
+    the segment names, shapes and dtypes are pickled.
+
+    The methods mirror the in-process functions they replace
+    (`torchmcubes.marching_cubes`, `tsr.bake_texture.make_atlas`,
+    `trimesh.Trimesh.export`), so callers can pass them in as drop-ins.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        rembg_model: str = "u2net",
+        threads_per_worker: int = 1,
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            # fork would copy the parent's CUDA context and OpenMP state
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(rembg_model, threads_per_worker),
+        )
+        self._thread: Optional[threading.Thread] = None
+
+    def _call(
+        self, task: Callable, arrays: Sequence[Optional[np.ndarray]], *args
+    ) -> Dict[str, np.ndarray]:
+        handles = []
+        specs: List[Optional[ArraySpec]] = []
+        try:
+            for array in arrays:
+                if array is None:
+                    specs.append(None)
+                    continue
+                shm, spec = _share(array)
+                handles.append(shm)
+                specs.append(spec)
+            outputs = self._executor.submit(_run, task, specs, *args).result()
+            return {name: _take(spec) for name, spec in outputs.items()}
+        finally:
+            for shm in handles:
+                shm.close()
+                shm.unlink()
+
+    def warmup(self) -> None:
+        # starts every worker and builds its rembg session
+        futures = [
+            self._executor.submit(_warmup_task) for _ in range(self.max_workers)
+        ]
+        pids = {future.result() for future in futures}
+        logging.info(f"Started {len(pids)} CPU pool workers")
+
+    def warmup_async(self) -> threading.Thread:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self.warmup, name="cpu-pool", daemon=True
+            )
+            self._thread.start()
+        return self._thread
+
+    def preprocess_images(
+        self, images: List[PIL.Image.Image], foreground_ratios: List[float]
+    ) -> List[PIL.Image.Image]:
+        """Remove the backgrounds, in one rembg batch, and composite each
+        object over gray."""
+        arrays = [
+            np.asarray(image.convert("RGBA" if "A" in image.getbands() else "RGB"))
+            for image in images
+        ]
+        outputs = self._call(_preprocess_task, arrays, list(foreground_ratios))
+        return [Image.fromarray(outputs[f"image{i}"]) for i in range(len(images))]
+
+    def preprocess_image(
+        self, image: PIL.Image.Image, foreground_ratio: float
+    ) -> PIL.Image.Image:
+        """Remove the background and composite the object over gray."""
+        return self.preprocess_images([image], [foreground_ratio])[0]
+
+    def marching_cubes(self, level, isovalue: float):
+        import torch
+
+        outputs = self._call(
+            _marching_cubes_task,
+            [level.detach().float().cpu().numpy()],
+            isovalue,
+        )
+        return (
+            torch.from_numpy(outputs["v_pos"]).to(level.device),
+            torch.from_numpy(outputs["t_pos_idx"]).to(level.device),
+        )
+
+    def make_atlas(self, mesh, texture_resolution: int, texture_padding: int):
+        return self._call(
+            _make_atlas_task,
+            [np.asarray(mesh.vertices), np.asarray(mesh.faces)],
+            texture_resolution,
+            texture_padding,
+        )
+
+    def export_mesh(self, mesh, file_type: str) -> bytes:
+        vertex_colors = None
+        if mesh.visual.kind == "vertex":
+            vertex_colors = np.asarray(mesh.visual.vertex_colors)
+        outputs = self._call(
+            _export_mesh_task,
+            [np.asarray(mesh.vertices), np.asarray(mesh.faces), vertex_colors],
+            file_type,
+        )
+        return outputs["data"].tobytes()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,99 @@
+import logging
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+def available_cores() -> List[int]:
+    # respects taskset and cgroup cpusets, unlike os.cpu_count()
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def parse_core_sets(spec: str, replicas: int) -> Optional[List[List[int]]]:
+    """Core sets for each replica from TSR_CPU_AFFINITY.
+
+    "auto" splits the available cores into `replicas` contiguous blocks, and
+    explicit sets are separated by semicolons, e.g. "0-7;8-15". An empty spec
+    disables pinning.
+    """
+    spec = spec.strip()
+    if not spec:
+        return None
+    if spec == "auto":
+        cores = available_cores()
+        size = max(1, len(cores) // replicas)
+        return [cores[i * size : (i + 1) * size] or cores for i in range(replicas)]
+    core_sets = []
+    for part in spec.split(";"):
+        cores = []
+        for item in part.split(","):
+            if "-" in item:
+                lo, hi = item.split("-")
+                cores.extend(range(int(lo), int(hi) + 1))
+            elif item.strip():
+                cores.append(int(item))
+        core_sets.append(cores)
+    return core_sets
+
+
+@dataclass
+class CpuServingConfig:
+    """Thread budget and core placement for serving TSR without a GPU.
+
+    Each replica is an inference worker with its own batch loop, and the
+    replicas share one copy of the weights since a forward pass doesn't
+    modify them. With default torch threading every replica would start an
+    OpenMP team as large as the machine and they would oversubscribe the
+    cores. Instead each gets `intra_op_threads`, and with `core_sets` its
+    threads are pinned to a disjoint set of cores.
+    """
+
+    replicas: int = 1
+    intra_op_threads: int = 1
+    inter_op_threads: int = 1
+    core_sets: Optional[List[List[int]]] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["CpuServingConfig"]:
+        """None unless TSR_CPU_REPLICAS is set."""
+        replicas = int(os.getenv("TSR_CPU_REPLICAS", "0"))
+        if replicas <= 0:
+            return None
+        core_sets = parse_core_sets(os.getenv("TSR_CPU_AFFINITY", ""), replicas)
+        cores_per_replica = (
+            len(core_sets[0]) if core_sets else len(available_cores()) // replicas
+        )
+        return cls(
+            replicas=replicas,
+            intra_op_threads=int(
+                os.getenv("TSR_INTRA_OP_THREADS", str(max(1, cores_per_replica)))
+            ),
+            inter_op_threads=int(os.getenv("TSR_INTER_OP_THREADS", "1")),
+            core_sets=core_sets,
+        )
+
+    def configure_torch(self) -> None:
+        import torch
+
+        torch.set_num_threads(self.intra_op_threads)
+        try:
+            torch.set_interop_threads(self.inter_op_threads)
+        except RuntimeError:
+            # only allowed before the first inter-op parallel call
+            logging.warning("torch inter-op threads were already initialized")
+        logging.info(
+            f"CPU serving with {self.replicas} replicas, "
+            f"{self.intra_op_threads} intra-op and {self.inter_op_threads} inter-op threads"
+        )
+
+    def pin(self, worker_index: int) -> None:
+        """Pin the calling thread, and the OpenMP threads it later starts, to
+        the cores of replica `worker_index % replicas`."""
+        if not self.core_sets or not hasattr(os, "sched_setaffinity"):
+            return
+        cores = self.core_sets[worker_index % len(self.core_sets)]
+        # on Linux, pid 0 is the calling thread rather than the whole process
+        os.sched_setaffinity(0, cores)
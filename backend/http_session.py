@@ -0,0 +1,51 @@
+import os
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (connect, read) in seconds
+DEFAULT_TIMEOUT = (5.0, 60.0)
+
+_session: Optional[requests.Session] = None
+_lock = threading.Lock()
+
+
+def create_session(
+    pool_maxsize: int = 32,
+    retries: int = 3,
+    backoff_factor: float = 0.5,
+) -> requests.Session:
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=8, pool_maxsize=pool_maxsize, max_retries=retry
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """The process-wide session, so downloads reuse kept-alive connections."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = create_session(
+                    pool_maxsize=int(os.getenv("HTTP_POOL_SIZE", "32")),
+                    retries=int(os.getenv("HTTP_RETRIES", "3")),
+                )
+    return _session
+
+
+def fetch(url: str, timeout=DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+    return get_session().get(url, timeout=timeout, **kwargs)
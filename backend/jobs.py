@@ -0,0 +1,228 @@
+import itertools
+import logging
+import math
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import JOBS, JOBS_REJECTED
+
+# lower runs first; batch precompute only gets workers no interactive job wants
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+
+class QueueFullError(RuntimeError):
+    def __init__(self, priority: str, retry_after: int):
+        super().__init__(f"Too many queued {priority} jobs, retry in {retry_after}s")
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+@dataclass
+class Job:
+    id: str
+    status: str = "queued"  # queued | running | succeeded | failed
+    priority: str = "interactive"
+    stage: Optional[str] = None
+    stages: List[Dict[str, Any]] = field(default_factory=list)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    # set once the job's triplanes are in the scene-code store
+    scene_key: Optional[str] = None
+    # set by jobs that ran the model; only those feed the job time estimate
+    # behind Retry-After, since cache hits finish in milliseconds
+    ran_inference: bool = False
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    _changed: threading.Condition = field(
+        default_factory=threading.Condition, repr=False
+    )
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def emit(self, event: str, data: Any) -> None:
+        with self._changed:
+            self.events.append({"id": len(self.events), "event": event, "data": data})
+            self._changed.notify_all()
+
+    def wait_for_events(self, after: int, timeout: float) -> List[Dict[str, Any]]:
+        """Events with an id of `after` or later, waiting up to `timeout` for one."""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > after, timeout)
+            return self.events[after:]
+
+    def start_stage(self, name: str) -> None:
+        self.stage = name
+        self.stages.append({"name": name, "status": "running", "duration_ms": None})
+        self.emit("stage", {"name": name})
+
+    def end_stage(self, name: str, duration_ms: Optional[float] = None) -> None:
+        for stage in reversed(self.stages):
+            if stage["name"] == name and stage["status"] == "running":
+                stage["status"] = "done"
+                stage["duration_ms"] = duration_ms
+                break
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "stage": self.stage,
+            "stages": [dict(stage) for stage in self.stages],
+            "result": self.result,
+            "error": self.error,
+            "scene_key": self.scene_key,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """Runs pipeline jobs on a bounded worker pool and keeps their status.
+
+    `fn` is called as `fn(job, *args, **kwargs)`; it can report progress
+    through `job.start_stage`/`job.end_stage` and its return value becomes
+    the job result.
+
+    Admission is bounded: at most `max_queue_depth` jobs wait for a worker,
+    and batch jobs only while fewer than `max_batch_queue_depth` are waiting,
+    so a precompute backlog can't lock out interactive requests. Past that
+    `submit` raises QueueFullError with a retry estimate from the measured
+    job duration, instead of queueing work the workers can't reach in time.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_history: int = 1000,
+        max_queue_depth: int = 32,
+        max_batch_queue_depth: Optional[int] = None,
+        worker_init: Optional[Callable[[int], None]] = None,
+    ):
+        self.max_workers = max_workers
+        self.max_history = max_history
+        self.max_queue_depth = max_queue_depth
+        if max_batch_queue_depth is None:
+            max_batch_queue_depth = max_queue_depth // 2
+        self.max_batch_queue_depth = min(max_batch_queue_depth, max_queue_depth)
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._queued = 0
+        # moving average of how long a job holds a worker
+        self._job_seconds: Optional[float] = None
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.worker_init = worker_init
+        self._workers = [
+            threading.Thread(target=self._work, args=(i,), name=f"job-{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(
+        self,
+        fn: Callable[..., Dict[str, Any]],
+        *args,
+        priority: str = "interactive",
+        **kwargs,
+    ) -> Job:
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        limit = (
+            self.max_queue_depth
+            if priority == "interactive"
+            else self.max_batch_queue_depth
+        )
+        with self._lock:
+            if self._queued >= limit:
+                JOBS_REJECTED.inc(priority=priority)
+                raise QueueFullError(priority, self._retry_after())
+            job = Job(id=uuid.uuid4().hex, priority=priority)
+            self._jobs[job.id] = job
+            self._queued += 1
+            self._trim()
+        self._queue.put(
+            (PRIORITIES[priority], next(self._sequence), job, fn, args, kwargs)
+        )
+        return job
+
+    def queued(self) -> int:
+        with self._lock:
+            return self._queued
+
+    def retry_after(self) -> int:
+        with self._lock:
+            return self._retry_after()
+
+    def _retry_after(self) -> int:
+        # time for the workers to drain the queue ahead of a new job
+        job_seconds = self._job_seconds if self._job_seconds is not None else 30.0
+        waves = (self._queued + 1) / self.max_workers
+        return max(1, min(600, math.ceil(waves * job_seconds)))
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status == status)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _trim(self) -> None:
+        # drop the oldest finished jobs once the history is full
+        finished = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.done
+        ]
+        for job_id in finished[: max(0, len(self._jobs) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def _work(self, index: int) -> None:
+        if self.worker_init is not None:
+            self.worker_init(index)
+        while True:
+            _, _, job, fn, args, kwargs = self._queue.get()
+            with self._lock:
+                self._queued -= 1
+            self._run(job, fn, *args, **kwargs)
+
+    def _observe(self, seconds: float) -> None:
+        with self._lock:
+            if self._job_seconds is None:
+                self._job_seconds = seconds
+            else:
+                self._job_seconds = 0.8 * self._job_seconds + 0.2 * seconds
+
+    def _run(self, job: Job, fn: Callable[..., Dict[str, Any]], *args, **kwargs):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = "succeeded"
+        except Exception as e:
+            logging.exception(f"Job {job.id} failed")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            JOBS.inc(status=job.status)
+            job.stage = None
+            job.finished_at = time.time()
+            if job.ran_inference:
+                self._observe(job.finished_at - job.started_at)
+        # the final event is what streaming clients wait for
+        if job.status == "succeeded":
+            job.emit("done", job.result)
+        else:
+            job.emit("error", {"error": job.error})
@@ -1,254 +1,631 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from dotenv import load_dotenv
-from openai import OpenAI
 import os
-import boto3
 import re
-import requests
+import tempfile
+import uuid
 import json
+from io import BytesIO
 import argparse
 import logging
-import time
-from botocore.exceptions import NoCredentialsError
 import numpy as np
-import rembg
-import torch
-import xatlas
 from PIL import Image
-from tsr.system import TSR
-from tsr.utils import remove_background, resize_foreground, save_video
-from tsr.bake_texture import bake_texture
+from asset_cache import AssetCache
+from batching import InferenceBatcher, PreprocessBatcher
+from canonical import PlantIndex
+from cpu_pool import CpuPool, composite_foreground
+from cpu_serving import CpuServingConfig
+from jobs import PRIORITIES, JobQueue, QueueFullError
+import metrics
+from http_session import fetch
+from model_registry import ModelNotReadyError, ModelRegistry
+from rembg_pool import RembgSessionPool
+from providers import create_provider
+from storage import create_s3_client, object_url
+from timer import Timer
+from uploads import Uploader
 
 app = Flask(__name__)
 
+is_cpu_pool_worker = __name__ == "__mp_main__"
+
 load_dotenv()
-client = OpenAI()
-s3 = boto3.client(
-    "s3",
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_KEY"),
-)
+logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+
 bucket_name = "greenspace-berkeley-hackathon"
 
-# ... (keep the Timer class and get_unique_output_dir function as they are)
-class Timer:
-    def __init__(self):
-        self.items = {}
-        self.time_scale = 1000.0  # ms
-        self.time_unit = "ms"
-
-    def start(self, name: str) -> None:
-        if torch.cuda.is_available():
-            torch.cuda.synchronize()
-        self.items[name] = time.time()
-        logging.info(f"{name} ...")
-
-    def end(self, name: str) -> float:
-        if name not in self.items:
-            return
-        if torch.cuda.is_available():
-            torch.cuda.synchronize()
-        start_time = self.items.pop(name)
-        delta = time.time() - start_time
-        t = delta * self.time_scale
-        logging.info(f"{name} finished in {t:.2f}{self.time_unit}.")
+DEFAULT_GENERATION_PARAMS = {
+    "mc_resolution": 256,
+    "bake_texture": False,
+    "texture_resolution": 2048,
+    "model_save_format": "obj",
+}
 
-def save_image(image_url, plant_name):
-    response = requests.get(image_url)
-    if response.status_code == 200:
-        with open(f"{plant_name}.jpg", "wb") as file:
-            file.write(response.content)
+# Requested resolutions are clamped to these. Marching cubes memory grows with
+# the cube of mc_resolution and the texture bake with the square of
+# texture_resolution, so one request can't take the GPU down.
+GENERATION_PARAM_RANGES = {
+    "mc_resolution": (32, 512),
+    "texture_resolution": (256, 4096),
+}
+
+def s3_url(key):
+    return object_url(s3, bucket_name, key)
+
+def safe_filename(name):
+    return re.sub(r"[^\w\-. ]", "_", name).strip() or "plant"
+
+def save_local(folder, filename, data):
+    # write-then-rename so concurrent jobs never leave a half-written file
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".", suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    path = os.path.join(folder, filename)
+    os.replace(tmp_path, path)
+    return path
+
+def preprocess_images(images, foreground_ratios):
+    # one rembg batch for all images, then each composited over gray
+    if cpu_pool is not None:
+        return cpu_pool.preprocess_images(images, foreground_ratios)
+    images = rembg_pool.remove_background_batch(images)
+    return [
+        composite_foreground(image, foreground_ratio)
+        for image, foreground_ratio in zip(images, foreground_ratios)
+    ]
+
+# Services are only built in the server process. CPU pool workers are
+# spawned and re-import this file as __mp_main__ when it is run as a script;
+# they only run cpu_pool's task functions and must not start queues, thread
+# pools, clients or model loads of their own
+if not is_cpu_pool_worker:
+    # GPU-less nodes: TSR_CPU_REPLICAS=N runs N inference workers with
+    # TSR_INTRA_OP_THREADS/TSR_INTER_OP_THREADS each, pinned to the core sets in
+    # TSR_CPU_AFFINITY ("auto" or e.g. "0-7;8-15"); see cpu_serving.py
+    cpu_serving = CpuServingConfig.from_env()
+    pin_worker = cpu_serving.pin if cpu_serving is not None else None
 
-def process_with_gpt4(text):
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        response_format={ "type": "json_object" },
-        messages=[
-            {"role": "system", "content": "Give me an answer in a json format like this: {'plant': {'name': '','instructions': {'watering frequency': '','pruning schedule': ''},'benefits': {'carbon sequestration': 'Very High | High | Medium | Low | Very Low','oxygen production': 'Very High | High | Medium | Low | Very Low','temperature regulation': 'Very High | High | Medium | Low | Very Low','air quality improvement': '','other benefits': ''}}}"},
-            {"role": "user", "content": text},
-        ]
+    model_registry = ModelRegistry(
+        # a Hub repo id, a model directory, or a bundle made with
+        # `python -m tsr.bundle`, which loads without any network access
+        pretrained_model_name_or_path=os.getenv("TSR_MODEL", "stabilityai/TripoSR"),
+        device=os.getenv("TSR_DEVICE", "cuda:0"),
+        chunk_size=int(os.getenv("TSR_CHUNK_SIZE", "8192")),
+        # fp32 | fp16 | bf16 | auto (fp16 on CUDA, bf16 on CPUs that support it);
+        # check mesh accuracy with benchmarks/check_precision.py before lowering it
+        precision=os.getenv("TSR_PRECISION", "fp32"),
+        # one QKV/KV matmul per attention block instead of three/two
+        fuse_projections=os.getenv("TSR_FUSE_PROJECTIONS", "1") != "0",
+        # opt-in torch.compile ("default", "reduce-overhead", "max-autotune"),
+        # compiled for every batch size the batcher can form before going ready
+        compile_mode=os.getenv("TSR_COMPILE") or None,
+        warmup_batch_sizes=range(1, int(os.getenv("TSR_MAX_BATCH_SIZE", "4")) + 1)
+        if os.getenv("TSR_COMPILE")
+        else (1,),
+        # "int8" for dynamic int8 linear layers on CPU, from a pre-quantized
+        # artifact if TSR_QUANTIZED_WEIGHTS points at one
+        quantization=os.getenv("TSR_QUANTIZATION") or None,
+        quantized_weights=os.getenv("TSR_QUANTIZED_WEIGHTS") or None,
+        cpu_serving=cpu_serving,
     )
-    response_message_content = response.choices[0].message.content
-    response_json = json.loads(response_message_content)
+    model_registry.load_async()
 
-    dir_info = "info"
-    os.makedirs(dir_info, exist_ok=True)
+    inference_batcher = InferenceBatcher(
+        model_registry,
+        max_batch_size=int(os.getenv("TSR_MAX_BATCH_SIZE", "4")),
+        max_wait_ms=float(os.getenv("TSR_BATCH_WAIT_MS", "10")),
+        num_workers=cpu_serving.replicas if cpu_serving is not None else 1,
+        worker_init=pin_worker,
+    )
 
-    plant_name = response_json["plant"]["name"]
+    # rembg, CPU marching cubes, xatlas charting and mesh export run in worker
+    # processes; CPU_POOL_WORKERS=0 keeps them on the job threads instead
+    cpu_pool_workers = int(os.getenv("CPU_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+    cpu_pool = CpuPool(max_workers=cpu_pool_workers) if cpu_pool_workers > 0 else None
 
-    info_path = os.path.join(dir_info, f"{plant_name}.json")
+    rembg_pool = RembgSessionPool(size=int(os.getenv("REMBG_POOL_SIZE", "0")) or None)
+    if cpu_pool is not None:
+        cpu_pool.warmup_async()
+    else:
+        rembg_pool.warmup_async()
 
-    with open(info_path, 'w') as json_file:
-        json.dump(response_json, json_file, indent=4)
-    print(f'Response saved to {info_path}')
+    # Background removal of images from jobs that reach preprocessing at the
+    # same time runs as one U^2-Net batch, one batch per pool worker or session
+    preprocess_batcher = PreprocessBatcher(
+        preprocess_images,
+        max_batch_size=int(os.getenv("REMBG_MAX_BATCH_SIZE", "4")),
+        max_wait_ms=float(os.getenv("REMBG_BATCH_WAIT_MS", "10")),
+        num_workers=cpu_pool.max_workers if cpu_pool is not None else rembg_pool.size,
+    )
 
-    folder = "info/"
-    key = folder + os.path.basename(info_path)
-    s3.upload_file(info_path, bucket_name, key)
-    img_url = f"https://{bucket_name}.s3.amazonaws.com/{key}"
+    # Requests beyond the queue depth get a 429 instead of piling up; batch
+    # precompute jobs are cut off earlier to keep room for interactive ones
+    pipeline_max_queue_depth = int(os.getenv("PIPELINE_MAX_QUEUE_DEPTH", "32"))
+    job_queue = JobQueue(
+        max_workers=int(os.getenv("PIPELINE_WORKERS", "2")),
+        max_queue_depth=pipeline_max_queue_depth,
+        max_batch_queue_depth=int(
+            os.getenv("PIPELINE_MAX_BATCH_QUEUE_DEPTH", str(pipeline_max_queue_depth // 2))
+        ),
+        # mesh extraction on the job threads stays on its replica's cores
+        worker_init=pin_worker,
+    )
 
-    return plant_name
+    metrics.QUEUE_DEPTH.set_function(job_queue.queued)
+    metrics.JOBS_IN_FLIGHT.set_function(lambda: job_queue.count("running"))
+    metrics.INFERENCE_QUEUE_DEPTH.set_function(inference_batcher.pending)
 
-def generate_plant_image(plant_name):
-    response = client.images.generate(
-        model="dall-e-3",
-        prompt="Generate a realistic image of a single " + plant_name + " tree, showing top to bottom with attention to detail, no shadows, with a plain background.",
-        size="1024x1024",
-        quality="standard",
-        n=1,
+    asset_cache = AssetCache(
+        index_path=os.getenv("ASSET_CACHE_INDEX", "cache/assets.json"),
+        max_entries=int(os.getenv("ASSET_CACHE_MAX_ENTRIES", "1000")),
     )
-    image_url = response.data[0].url
-    print(image_url)
 
-    dir_img = "img"
-    os.makedirs(dir_img, exist_ok=True)
+    # Resolves prompts like "apple trees" or "Malus domestica" to a plant that was
+    # already generated, before any GPT-4o, DALL-E or TSR call
+    plant_index = PlantIndex(
+        index_path=os.getenv("PLANT_INDEX", "cache/plants.json"),
+        # per-word similarity for fuzzy matches of plant and scientific names
+        cutoff=float(os.getenv("PLANT_MATCH_CUTOFF", "0.9")),
+    )
+    for entry in asset_cache.entries():
+        plant_index.add(entry["plant"])
+
+    # Stages hand images, meshes and textures to each other in memory; set
+    # PERSIST_ASSETS=0 to stop also writing them to info/, img/ and 3d/
+    persist_assets = os.getenv("PERSIST_ASSETS", "1") != "0"
+
+    # Triplanes of every generated image are kept so meshes can be re-extracted
+    # at another resolution or threshold without running the model again;
+    # SCENE_STORE_DIR="" turns this off
+    scene_store_dir = os.getenv("SCENE_STORE_DIR", "cache/scene_codes")
+    scene_store = None
+    if scene_store_dir:
+        from tsr.scene_store import SceneCodeStore
+
+        scene_store = SceneCodeStore(
+            scene_store_dir,
+            # float16 halves the disk use, at the cost of rounded codes
+            dtype=os.getenv("SCENE_STORE_DTYPE", "float32"),
+            # about 2MB per TripoSR code in float32
+            max_entries=int(os.getenv("SCENE_STORE_MAX_ENTRIES", "1000")),
+        )
+
+    # GREENSPACE_OFFLINE=1 runs the whole pipeline without network or credentials:
+    # canned plant info and images, and objects stored under object_store/
+    offline = os.getenv("GREENSPACE_OFFLINE", "0") == "1"
+    provider = create_provider(offline)
+    s3 = create_s3_client(offline)
 
-    image_path = os.path.join(dir_img, f"{plant_name}.png")
+    uploader = Uploader(
+        s3,
+        bucket_name,
+        url_for=s3_url,
+        max_workers=int(os.getenv("UPLOAD_WORKERS", "8")),
+    )
 
-    response = requests.get(image_url, stream=True)
+def save_image(image_url, plant_name):
+    response = fetch(image_url)
     if response.status_code == 200:
-    # Open a local file in binary write mode
-        with open(f"{image_path}", "wb") as file:
-            # Write the content of the response to the file
-            for chunk in response.iter_content(chunk_size=8192):
-                file.write(chunk)
-        print("Image downloaded successfully")
-
-        folder = "img/"
-        key = folder + os.path.basename(image_path)
-        s3.upload_file(image_path, bucket_name, key)
-        img_url = f"https://{bucket_name}.s3.amazonaws.com/{key}"
-    else:
-        print(f"Failed to retrieve image. HTTP Status code: {response.status_code}")
-    return (f"{image_path}")
+        with open(f"{plant_name}.jpg", "wb") as file:
+            file.write(response.content)
+
+def process_with_gpt4(text, uploads, job_id, job=None):
+    response_json = provider.plant_info(text)
+    if job is not None:
+        job.emit("info", response_json)
+
+    plant_name = response_json["plant"]["name"]
+    info_bytes = json.dumps(response_json, indent=4).encode("utf-8")
+    filename = f"{safe_filename(plant_name)}.json"
+
+    if persist_assets:
+        info_path = save_local("info", filename, info_bytes)
+        print(f'Response saved to {info_path}')
+
+    uploads.add_fileobj("info", BytesIO(info_bytes), f"info/{job_id}/{filename}")
+
+    return response_json["plant"]
+
+def generate_plant_image(plant_name, uploads, job_id):
+    image_bytes = provider.plant_image(plant_name)
+    print("Image downloaded successfully")
+
+    filename = f"{safe_filename(plant_name)}.png"
+    if persist_assets:
+        save_local("img", filename, image_bytes)
+
+    # The upload and the 3D stage each read their own view of the same bytes
+    uploads.add_fileobj("image", BytesIO(image_bytes), f"img/{job_id}/{filename}")
+    return Image.open(BytesIO(image_bytes))
 
 def generate_3d_model_and_upload_to_s3(
-    image_path,
+    image,
     name,
-    device="cuda:0",
-    pretrained_model_name_or_path="stabilityai/TripoSR",
-    chunk_size=8192,
     mc_resolution=256,
     remove_bg=True,
     foreground_ratio=0.85,
     model_save_format="obj",
     bake_texture=False,
     texture_resolution=2048,
-    render=False
+    render=False,
+    preview=False,
+    threshold=25.0,
+    scene_key=None,
+    job=None,
+    uploads=None,
 ):
-    timer = Timer()
-    
-    # Set up logging
-    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
-    
-    # Check for CUDA availability
-    if not torch.cuda.is_available():
-        device = "cpu"
-    
-    # Initialize model
-    timer.start("Initializing model")
-    model = TSR.from_pretrained(
-        pretrained_model_name_or_path,
-        config_name="config.yaml",
-        weight_name="model.ckpt",
-    )
-    model.renderer.set_chunk_size(chunk_size)
-    model.to(device)
-    timer.end("Initializing model")
-    
-    # Process image
-    timer.start("Processing image")
-    if not remove_bg:
-        image = np.array(Image.open(image_path).convert("RGB"))
+    # Report each timed stage on the job so /jobs/<id> can show progress
+    if job is not None:
+        timer = Timer(on_start=job.start_stage, on_end=job.end_stage)
     else:
-        rembg_session = rembg.new_session()
-        image = remove_background(Image.open(image_path), rembg_session)
-        image = resize_foreground(image, foreground_ratio)
-        image = np.array(image).astype(np.float32) / 255.0
-        image = image[:, :, :3] * image[:, :, 3:4] + (1 - image[:, :, 3:4]) * 0.5
-        image = Image.fromarray((image * 255.0).astype(np.uint8))
-    timer.end("Processing image")
-    
-    # Create a temporary directory for output
-    temp_dir = "temp_output"
-    os.makedirs(temp_dir, exist_ok=True)
+        timer = Timer()
+    if uploads is None:
+        uploads = uploader.batch()
+
+    # tsr pulls in torch, trimesh and transformers; by the time a job gets here
+    # the model registry has already imported them in the background
+    from tsr.utils import save_video
+
+    # The model is loaded once at startup; this only waits if it is still warming up
+    model = model_registry.get()
+
+    if isinstance(image, str):
+        image = Image.open(image)
+
+    # An image the model has already seen, or an explicit scene_key, reuses
+    # the stored triplanes and skips preprocessing and inference
+    scene_codes = None
+    if scene_store is not None:
+        if scene_key is None:
+            # codes from other weights, precision or quantization don't match
+            scene_key = scene_store.key(
+                image,
+                model=model_registry.identity(),
+                remove_bg=remove_bg,
+                foreground_ratio=foreground_ratio,
+            )
+        scene_codes = scene_store.load(scene_key, device=model_registry.device)
+    if scene_codes is None and image is None:
+        raise ValueError(f"No stored scene code {scene_key}")
+
+    if scene_codes is None:
+        # Process image
+        timer.start("Processing image")
+        if not remove_bg:
+            image = np.array(image.convert("RGB"))
+        else:
+            # batched together with other jobs that reach this stage at the same time
+            image = preprocess_batcher(image, foreground_ratio)
+        timer.end("Processing image")
+
+        # Run model
+        timer.start("Running model")
+        # batched together with other jobs that reach this stage at the same time
+        scene_codes = inference_batcher(image)
+        timer.end("Running model")
+        if job is not None:
+            job.ran_inference = True
+
+        if scene_store is not None:
+            scene_store.save(scene_key, scene_codes[0])
+    if job is not None and scene_store is not None:
+        job.scene_key = scene_key
+
+    # Every run gets its own scratch directory and object keys, so concurrent
+    # jobs (even for the same plant) never overwrite each other's files
+    job_id = job.id if job is not None else uuid.uuid4().hex
+    filename = safe_filename(name)
     dir_3d = "3d"
-    os.makedirs(dir_3d, exist_ok=True)
-    
-    # Run model
-    timer.start("Running model")
-    with torch.no_grad():
-        scene_codes = model([image], device=device)
-    timer.end("Running model")
-    
-    if render:
-        timer.start("Rendering")
-        render_images = model.render(scene_codes, n_views=30, return_type="pil")
-        for ri, render_image in enumerate(render_images[0]):
-            render_image.save(os.path.join(temp_dir, f"render_{ri:03d}.png"))
-        save_video(render_images[0], os.path.join(temp_dir, f"render.mp4"), fps=30)
-        timer.end("Rendering")
-    
-    # Extract mesh
-    timer.start("Extracting mesh")
-    meshes = model.extract_mesh(scene_codes, not bake_texture, resolution=mc_resolution)
-    timer.end("Extracting mesh")
-    
-    # Save mesh and texture
-    out_mesh_path = os.path.join(dir_3d, f"{name}.{model_save_format}")
-    if bake_texture:
-        out_texture_path = os.path.join(dir_3d, "texture.png")
-        timer.start("Baking texture")
-        bake_output = bake_texture(meshes[0], model, scene_codes[0], texture_resolution)
-        timer.end("Baking texture")
-        
-        timer.start("Exporting mesh and texture")
-        xatlas.export(
-            out_mesh_path,
-            meshes[0].vertices[bake_output["vmapping"]],
-            bake_output["indices"],
-            bake_output["uvs"],
-            meshes[0].vertex_normals[bake_output["vmapping"]],
+
+    with tempfile.TemporaryDirectory(prefix=f"greenspace-{job_id}-") as temp_dir:
+        if preview:
+            # one small view so streaming clients see the shape long before the mesh
+            timer.start("Rendering preview")
+            preview_image = model.render(
+                scene_codes, n_views=1, height=128, width=128, return_type="pil"
+            )[0][0]
+            preview_data = BytesIO()
+            preview_image.save(preview_data, format="PNG")
+            uploads.add_fileobj("preview", preview_data, f"previews/{job_id}/preview.png")
+            timer.end("Rendering preview")
+
+        if render:
+            timer.start("Rendering")
+            render_images = model.render(scene_codes, n_views=30, return_type="pil")
+            # the ffmpeg writer needs a real file, so the video goes through temp_dir
+            render_path = os.path.join(temp_dir, "render.mp4")
+            save_video(render_images[0], render_path, fps=30)
+            # upload while the mesh is being extracted
+            uploads.add_file("render", render_path, f"renders/{job_id}/render.mp4")
+            timer.end("Rendering")
+
+        # Extract mesh
+        timer.start("Extracting mesh")
+        # CUDA marching cubes stays on the GPU; the CPU version goes to the pool
+        mc_func = None
+        if cpu_pool is not None and model_registry.device == "cpu":
+            mc_func = cpu_pool.marching_cubes
+        meshes = model.extract_mesh(
+            scene_codes,
+            not bake_texture,
+            resolution=mc_resolution,
+            threshold=threshold,
+            mc_func=mc_func,
         )
-        Image.fromarray((bake_output["colors"] * 255.0).astype(np.uint8)).transpose(
-            Image.FLIP_TOP_BOTTOM
-        ).save(out_texture_path)
-        timer.end("Exporting mesh and texture")
-    else:
-        timer.start("Exporting mesh")
-        meshes[0].export(out_mesh_path)
-        timer.end("Exporting mesh")
-    
-    # Upload to S3
-    timer.start("Uploading to S3")
-    try:
-        s3.upload_file(out_mesh_path, bucket_name, f"threed/{name}.{model_save_format}")
+        timer.end("Extracting mesh")
+
+        # Save mesh and texture
+        mesh_filename = f"{filename}.{model_save_format}"
+        mesh_key = f"threed/{job_id}/{mesh_filename}"
         if bake_texture:
-            s3.upload_file(out_texture_path, bucket_name, "texture.png")
-        if render:
-            s3.upload_file(os.path.join(temp_dir, "render.mp4"), bucket_name, "render.mp4")
-        logging.info(f"Successfully uploaded to S3 bucket: {bucket_name}")
-    except NoCredentialsError:
-        logging.error("Credentials not available for S3 upload")
-    except Exception as e:
-        logging.error(f"Error uploading to S3: {str(e)}")
-    timer.end("Uploading to S3")
-    
-    # Clean up temporary files
-    for file in os.listdir(temp_dir):
-        os.remove(os.path.join(temp_dir, file))
-    os.rmdir(temp_dir)
+            # only baking needs xatlas and an OpenGL context
+            import xatlas
+            from tsr.bake_texture import bake_texture as bake_texture_atlas
+
+            timer.start("Baking texture")
+            bake_kwargs = {}
+            if cpu_pool is not None:
+                bake_kwargs["make_atlas_fn"] = cpu_pool.make_atlas
+            bake_output = bake_texture_atlas(
+                meshes[0], model, scene_codes[0], texture_resolution, **bake_kwargs
+            )
+            timer.end("Baking texture")
+
+            timer.start("Exporting mesh and texture")
+            # xatlas can only export to a path
+            out_mesh_path = os.path.join(temp_dir, mesh_filename)
+            xatlas.export(
+                out_mesh_path,
+                meshes[0].vertices[bake_output["vmapping"]],
+                bake_output["indices"],
+                bake_output["uvs"],
+                meshes[0].vertex_normals[bake_output["vmapping"]],
+            )
+            texture = BytesIO()
+            Image.fromarray((bake_output["colors"] * 255.0).astype(np.uint8)).transpose(
+                Image.FLIP_TOP_BOTTOM
+            ).save(texture, format="PNG")
+            if persist_assets:
+                with open(out_mesh_path, "rb") as f:
+                    save_local(dir_3d, mesh_filename, f.read())
+                save_local(dir_3d, f"{filename}_texture.png", texture.getvalue())
+            timer.end("Exporting mesh and texture")
+            uploads.add_file("mesh", out_mesh_path, mesh_key)
+            uploads.add_fileobj("texture", texture, f"threed/{job_id}/texture.png")
+        else:
+            timer.start("Exporting mesh")
+            if cpu_pool is not None:
+                mesh_data = cpu_pool.export_mesh(meshes[0], model_save_format)
+            else:
+                mesh_data = meshes[0].export(file_type=model_save_format)
+                if isinstance(mesh_data, str):
+                    mesh_data = mesh_data.encode("utf-8")
+            if persist_assets:
+                save_local(dir_3d, mesh_filename, mesh_data)
+            timer.end("Exporting mesh")
+            uploads.add_fileobj("mesh", BytesIO(mesh_data), mesh_key)
+
+        # Upload to S3; files in temp_dir must be sent before it is removed
+        timer.start("Uploading to S3")
+        assets = uploads.wait()
+        logging.info(f"Uploaded {', '.join(assets)} to bucket: {bucket_name}")
+        timer.end("Uploading to S3")
 
     logging.info("3D model generation and S3 upload complete")
+    return assets
+
+def parse_bool(value):
+    # JSON booleans, and the strings and numbers form fields send
+    if isinstance(value, str):
+        if value.strip().lower() in ("1", "true", "yes", "on"):
+            return True
+        if value.strip().lower() in ("0", "false", "no", "off", ""):
+            return False
+        raise ValueError(f"Not a boolean: {value!r}")
+    if value is None or isinstance(value, (bool, int, float)):
+        return bool(value)
+    raise TypeError(f"Not a boolean: {value!r}")
+
+def parse_generation_params(data):
+    params = dict(DEFAULT_GENERATION_PARAMS)
+    for name, default in DEFAULT_GENERATION_PARAMS.items():
+        if name not in data:
+            continue
+        if isinstance(default, bool):
+            params[name] = parse_bool(data[name])
+        elif isinstance(default, int):
+            params[name] = int(data[name])
+        else:
+            params[name] = str(data[name])
+    for name, (low, high) in GENERATION_PARAM_RANGES.items():
+        params[name] = min(max(params[name], low), high)
+    if params["model_save_format"] not in ("obj", "glb"):
+        raise ValueError(f"Unsupported model format: {params['model_save_format']}")
+    return params
+
+def run_pipeline(job, text, params, preview=False):
+    # The prompt is often a plant we've already generated, under its name, a
+    # plural, a typo or its scientific name
+    known_plant = plant_index.lookup(text)
+    if known_plant is not None:
+        cached = asset_cache.get(asset_cache.key(known_plant, **params))
+        if cached is not None:
+            job.scene_key = cached.get("scene_key")
+            return {"plant": cached["plant"], "assets": cached["assets"], "cached": True}
+
+    # Artifacts upload in the background while later stages compute, and each
+    # URL is streamed to /jobs/<id>/events as soon as its upload finishes
+    uploads = uploader.batch(
+        on_uploaded=lambda name, url: job.emit("asset", {"name": name, "url": url})
+    )
+    timer = Timer(on_start=job.start_stage, on_end=job.end_stage)
+
+    timer.start("Generating plant info")
+    plant = process_with_gpt4(text, uploads, job.id, job=job)
+    timer.end("Generating plant info")
+
+    # "Apple tree" and "Apple Trees" from GPT are stored as one plant, and the
+    # prompt and scientific name resolve to it from now on
+    plant_name = plant_index.add(
+        plant["name"], scientific_name=plant.get("scientific name"), aliases=[text]
+    )
+
+    cache_key = asset_cache.key(plant_name, **params)
+    cached = asset_cache.get(cache_key)
+    if cached is not None:
+        job.scene_key = cached.get("scene_key")
+        assets = {**cached["assets"], **uploads.wait()}
+        return {"plant": plant_name, "assets": assets, "cached": True}
+
+    timer.start("Generating image")
+    image = generate_plant_image(plant_name, uploads, job.id)
+    timer.end("Generating image")
+
+    assets = generate_3d_model_and_upload_to_s3(
+        image, plant_name, preview=preview, job=job, uploads=uploads, **params
+    )
+    if "mesh" in assets:
+        asset_cache.put(cache_key, {
+            "plant": plant_name,
+            "params": params,
+            "assets": assets,
+            "scene_key": job.scene_key,
+        })
+    return {"plant": plant_name, "assets": assets, "cached": False}
+
+def run_extract(job, scene_key, name, params, threshold=25.0, render=False):
+    assets = generate_3d_model_and_upload_to_s3(
+        None,
+        name,
+        threshold=threshold,
+        render=render,
+        scene_key=scene_key,
+        job=job,
+        uploads=uploader.batch(
+            on_uploaded=lambda name, url: job.emit("asset", {"name": name, "url": url})
+        ),
+        **params,
+    )
+    return {"plant": name, "assets": assets, "cached": False}
 
 @app.route("/process", methods=["POST"])
 def process():
     data = request.get_json()
     text = data["text"]
-    plant_name = process_with_gpt4(text)
-    image_path = generate_plant_image(plant_name)
-    generate_3d_model_and_upload_to_s3(image_path, plant_name)
-    return jsonify({"plant": plant_name})
+    try:
+        params = parse_generation_params(data)
+        preview = parse_bool(data.get("preview", False))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    priority = data.get("priority", "interactive")
+    if priority not in PRIORITIES:
+        return jsonify({"error": f"Unknown priority: {priority}"}), 400
+    try:
+        model_registry.get(timeout=0)
+    except ModelNotReadyError as e:
+        return jsonify({"error": str(e)}), 503
+    try:
+        job = job_queue.submit(
+            run_pipeline, text, params, priority=priority, preview=preview
+        )
+    except QueueFullError as e:
+        response = jsonify({"error": str(e), "retry_after": e.retry_after})
+        return response, 429, {"Retry-After": str(e.retry_after)}
+    return jsonify({
+        "job_id": job.id,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    }), 202
+
+@app.route("/scenes/<scene_key>/extract", methods=["POST"])
+def extract_scene(scene_key):
+    # New mesh, texture or render from stored triplanes, without the model pass
+    if scene_store is None or scene_key not in scene_store:
+        return jsonify({"error": f"Unknown scene {scene_key}"}), 404
+    data = request.get_json(silent=True) or {}
+    try:
+        params = parse_generation_params(data)
+        threshold = float(data.get("threshold", 25.0))
+        render = parse_bool(data.get("render", False))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        model_registry.get(timeout=0)
+    except ModelNotReadyError as e:
+        return jsonify({"error": str(e)}), 503
+    try:
+        job = job_queue.submit(
+            run_extract,
+            scene_key,
+            data.get("name", "plant"),
+            params,
+            threshold=threshold,
+            render=render,
+            priority=data.get("priority", "interactive"),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except QueueFullError as e:
+        response = jsonify({"error": str(e), "retry_after": e.retry_after})
+        return response, 429, {"Retry-After": str(e.retry_after)}
+    return jsonify({
+        "job_id": job.id,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    }), 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    return jsonify(job.to_dict())
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    # EventSource sends Last-Event-ID when it reconnects; replay from there
+    last_event_id = request.headers.get("Last-Event-ID")
+    start = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+
+    def stream():
+        sent = start
+        while True:
+            events = job.wait_for_events(sent, timeout=15.0)
+            if not events:
+                # comment line so proxies don't close an idle connection
+                yield ": keepalive\n\n"
+                continue
+            for event in events:
+                yield format_sse(event)
+                if event["event"] in ("done", "error"):
+                    return
+            sent += len(events)
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    return jsonify({"status": "ok"})
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    health = model_registry.health()
+    return jsonify(health), 200 if model_registry.ready else 503
 
 if __name__ == '__main__':
     app.run()
@@ -0,0 +1,242 @@
+import math
+import os
+import resource
+import sys
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Stages range from a few ms (image processing) to minutes (texture baking on CPU)
+DEFAULT_BUCKETS = (
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def collect(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines += self.collect()
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}"
+            for k, v in sorted(values.items())
+        ]
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_max(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = max(self._values.get(key, value), value)
+
+    def snapshot(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        # evaluated at scrape time, for values owned by another object
+        self._function = function
+
+    def collect(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}"
+            for k, v in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def mean(self, **labels) -> Optional[float]:
+        key = self._key(labels)
+        with self._lock:
+            if key not in self._counts or self._counts[key][-1] == 0:
+                return None
+            return self._sums[key] / self._counts[key][-1]
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            counts = {k: list(v) for k, v in self._counts.items()}
+            sums = dict(self._sums)
+        lines = []
+        for key in sorted(counts):
+            for bound, count in zip(self.buckets, counts[key]):
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(sums[key])}")
+            lines.append(f"{self.name}_count{labels} {counts[key][-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_LATENCY = REGISTRY.register(
+    Histogram(
+        "greenspace_stage_duration_seconds",
+        "Wall time of each pipeline stage.",
+        ["stage"],
+    )
+)
+STAGE_PEAK_RSS = REGISTRY.register(
+    Gauge(
+        "greenspace_stage_peak_rss_bytes",
+        "Highest resident set size sampled while each stage ran.",
+        ["stage"],
+    )
+)
+STAGE_PEAK_CUDA_MEMORY = REGISTRY.register(
+    Gauge(
+        "greenspace_stage_peak_cuda_memory_bytes",
+        "Highest CUDA memory allocated while each stage ran; overlapping stages share one window.",
+        ["stage"],
+    )
+)
+JOBS = REGISTRY.register(
+    Counter("greenspace_jobs_total", "Finished pipeline jobs.", ["status"])
+)
+JOBS_REJECTED = REGISTRY.register(
+    Counter(
+        "greenspace_jobs_rejected_total",
+        "Jobs turned away because the queue was full.",
+        ["priority"],
+    )
+)
+QUEUE_DEPTH = REGISTRY.register(
+    Gauge("greenspace_queue_depth", "Jobs waiting for a pipeline worker.")
+)
+JOBS_IN_FLIGHT = REGISTRY.register(
+    Gauge("greenspace_jobs_in_flight", "Jobs currently running.")
+)
+INFERENCE_QUEUE_DEPTH = REGISTRY.register(
+    Gauge(
+        "greenspace_inference_queue_depth",
+        "Images waiting for the next batched TSR forward.",
+    )
+)
+MODEL_COMPILE_SECONDS = REGISTRY.register(
+    Gauge(
+        "greenspace_model_compile_seconds",
+        "Time spent compiling the model at startup, including failed attempts.",
+    )
+)
+PROCESS_PEAK_RSS = REGISTRY.register(
+    Gauge("greenspace_process_peak_rss_bytes", "Peak resident set size of the process.")
+)
+
+
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+PROCESS_PEAK_RSS.set_function(peak_rss_bytes)
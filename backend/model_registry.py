@@ -0,0 +1,228 @@
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence
+
+from PIL import Image
+
+from metrics import MODEL_COMPILE_SECONDS
+from timer import Timer
+
+if TYPE_CHECKING:
+    from cpu_serving import CpuServingConfig
+    from tsr.system import TSR
+
+
+class ModelNotReadyError(RuntimeError):
+    pass
+
+
+class ModelRegistry:
+    """Process-wide holder for the TSR model.
+
+    The model is loaded once, pinned to a device and warmed up with a dummy
+    forward pass, so requests only pay for inference. torch and tsr are only
+    imported by `load()`, which keeps them off the import path of the server.
+
+    With `compile_mode` set, the backbone, post-processor and decoder are
+    compiled with torch.compile and the warmup compiles every batch size in
+    `warmup_batch_sizes`, so no request pays for compilation. If compiling
+    fails the model falls back to eager; both outcomes and the compile time
+    are reported by `health()`.
+
+    `quantization="int8"` serves the backbone and decoder with dynamic int8
+    linear layers on CPU, loaded from the `quantized_weights` artifact made
+    by benchmarks/calibrate_quantization.py when given, or quantized at load
+    otherwise. It is ignored on GPU.
+    """
+
+    def __init__(
+        self,
+        pretrained_model_name_or_path: str = "stabilityai/TripoSR",
+        config_name: str = "config.yaml",
+        weight_name: str = "model.ckpt",
+        device: str = "cuda:0",
+        chunk_size: int = 8192,
+        precision: str = "fp32",
+        fuse_projections: bool = True,
+        compile_mode: Optional[str] = None,
+        warmup_batch_sizes: Sequence[int] = (1,),
+        quantization: Optional[str] = None,
+        quantized_weights: Optional[str] = None,
+        cpu_serving: Optional["CpuServingConfig"] = None,
+    ):
+        self.pretrained_model_name_or_path = pretrained_model_name_or_path
+        self.config_name = config_name
+        self.weight_name = weight_name
+        # resolved against torch.cuda.is_available() in load()
+        self.device = device
+        self.chunk_size = chunk_size
+        self.precision = precision
+        self.fuse_projections = fuse_projections
+        self.compile_mode = compile_mode
+        self.warmup_batch_sizes = tuple(warmup_batch_sizes)
+        self.compile_info: Dict[str, Any] = {"mode": compile_mode, "status": "eager"}
+        if quantization not in (None, "int8"):
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        self.quantization = quantization
+        self.quantized_weights = quantized_weights
+        self.cpu_serving = cpu_serving
+
+        self.model: Optional["TSR"] = None
+        self.error: Optional[BaseException] = None
+        self._ready = threading.Event()
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def status(self) -> str:
+        if self.ready:
+            return "ready"
+        if self.error is not None:
+            return "failed"
+        if self._thread is not None or self._lock.locked():
+            return "loading"
+        return "idle"
+
+    def load(self) -> "TSR":
+        with self._lock:
+            if self.model is not None:
+                return self.model
+            timer = Timer()
+            try:
+                timer.start("Initializing model")
+                import torch
+                from tsr.system import TSR
+
+                if not torch.cuda.is_available():
+                    self.device = "cpu"
+                if self.device == "cpu" and self.cpu_serving is not None:
+                    # before the first forward starts torch's thread pools
+                    self.cpu_serving.configure_torch()
+                if self.quantization and self.device != "cpu":
+                    logging.warning(
+                        f"{self.quantization} quantization is CPU only, "
+                        f"serving the fp32 model on {self.device}"
+                    )
+                    self.quantization = None
+                if self.quantization and self.quantized_weights:
+                    from tsr.quantization import load_quantized
+
+                    model = load_quantized(self.quantized_weights)
+                else:
+                    model = TSR.from_pretrained(
+                        self.pretrained_model_name_or_path,
+                        config_name=self.config_name,
+                        weight_name=self.weight_name,
+                    )
+                    if self.quantization:
+                        from tsr.quantization import quantize_dynamic_int8
+
+                        quantize_dynamic_int8(model)
+                model.renderer.set_chunk_size(self.chunk_size)
+                model.to(self.device)
+                model.eval()
+                self.precision = model.set_precision(self.precision, self.device)
+                if self.fuse_projections and not self.quantization:
+                    # after .to(), which would copy the shared fused weights
+                    model.fuse_projections()
+                timer.end("Initializing model")
+
+                if self.compile_mode:
+                    self._compile(model, timer)
+
+                timer.start("Warming up model")
+                self._warmup(model)
+                timer.end("Warming up model")
+            except BaseException as e:
+                self.error = e
+                self._done.set()
+                logging.exception("Failed to load TSR model")
+                raise
+            self.model = model
+            self.error = None
+            self._ready.set()
+            self._done.set()
+            return model
+
+    def load_async(self) -> threading.Thread:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._load_quietly, name="model-registry", daemon=True
+            )
+            self._thread.start()
+        return self._thread
+
+    def _load_quietly(self) -> None:
+        try:
+            self.load()
+        except BaseException:
+            # already logged and recorded on self.error for the health check
+            pass
+
+    def _warmup(self, model: "TSR", extract_mesh: bool = False) -> None:
+        import torch
+
+        size = model.cfg.cond_image_size
+        dummy = Image.new("RGB", (size, size), (127, 127, 127))
+        for batch_size in self.warmup_batch_sizes:
+            with torch.no_grad():
+                scene_codes = model([dummy] * batch_size, device=self.device)
+        if extract_mesh:
+            # a coarse grid is enough: with static chunks the decoder sees
+            # the same shape at every resolution
+            model.extract_mesh(scene_codes[:1], True, resolution=32)
+
+    def _compile(self, model: "TSR", timer: Timer) -> None:
+        timer.start("Compiling model")
+        try:
+            # torch.compile can already fail when wrapping, e.g. for an
+            # unknown mode or an interpreter Dynamo doesn't support
+            model.compile(mode=self.compile_mode)
+            self._warmup(model, extract_mesh=True)
+        except Exception as e:
+            logging.warning(f"torch.compile failed, falling back to eager mode: {e}")
+            model.uncompile()
+            self.compile_info.update(status="fallback", error=str(e))
+        else:
+            self.compile_info["status"] = "compiled"
+        seconds = timer.end("Compiling model") / 1000.0
+        self.compile_info["seconds"] = seconds
+        MODEL_COMPILE_SECONDS.set(seconds)
+
+    def get(self, timeout: Optional[float] = None) -> "TSR":
+        if self.model is None and self._thread is None:
+            return self.load()
+        self._done.wait(timeout)
+        if not self.ready:
+            raise ModelNotReadyError(f"TSR model is {self.status}")
+        return self.model
+
+    def health(self) -> dict:
+        info = {
+            "status": self.status,
+            "model": self.pretrained_model_name_or_path,
+            "device": self.device,
+            "precision": self.precision,
+            "compile": dict(self.compile_info),
+            "quantization": self.quantization,
+        }
+        if self.error is not None:
+            info["error"] = str(self.error)
+        return info
+
+    def identity(self) -> Dict[str, Any]:
+        """The weights and numerics the model's outputs depend on, e.g. to key
+        stored scene codes. Precision and quantization are only final once
+        the model is loaded."""
+        return {
+            "model": self.pretrained_model_name_or_path,
+            "weights": self.weight_name,
+            "precision": self.precision,
+            "quantization": self.quantization,
+            "quantized_weights": self.quantized_weights if self.quantization else None,
+        }
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import time
+from io import BytesIO
+from typing import Any, Dict, Optional
+
+from PIL import Image
+
+from asset_cache import normalize_plant_name
+from http_session import fetch
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "examples")
+
+PLANT_INFO_PROMPT = "Give me an answer in a json format like this: {'plant': {'name': '','scientific name': '','instructions': {'watering frequency': '','pruning schedule': ''},'benefits': {'carbon sequestration': 'Very High | High | Medium | Low | Very Low','oxygen production': 'Very High | High | Medium | Low | Very Low','temperature regulation': 'Very High | High | Medium | Low | Very Low','air quality improvement': '','other benefits': ''}}}"
+
+
+class OpenAIProvider:
+    """Plant info from GPT-4o and plant images from DALL-E 3."""
+
+    def __init__(self, client: Any = None):
+        self._client = client
+
+    @property
+    def client(self) -> Any:
+        # the openai package is slow to import, so wait for the first request
+        if self._client is None:
+            from openai import OpenAI
+
+            self._client = OpenAI()
+        return self._client
+
+    def plant_info(self, text: str) -> Dict[str, Any]:
+        response = self.client.chat.completions.create(
+            model="gpt-4o",
+            response_format={ "type": "json_object" },
+            messages=[
+                {"role": "system", "content": PLANT_INFO_PROMPT},
+                {"role": "user", "content": text},
+            ]
+        )
+        return json.loads(response.choices[0].message.content)
+
+    def plant_image(self, plant_name: str) -> bytes:
+        response = self.client.images.generate(
+            model="dall-e-3",
+            prompt="Generate a realistic image of a single " + plant_name + " tree, showing top to bottom with attention to detail, no shadows, with a plain background.",
+            size="1024x1024",
+            quality="standard",
+            n=1,
+        )
+        image_url = response.data[0].url
+        print(image_url)
+
+        response = fetch(image_url)
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to retrieve image. HTTP Status code: {response.status_code}")
+        return response.content
+
+
+class LocalProvider:
+    """Deterministic stand-in for OpenAI that needs no network or credentials.
+
+    The same prompt always gives the same plant info, and every plant gets the
+    example image from `backend/examples/`. `latency_ms` simulates API time
+    for load tests. With `image_url` set, the image is downloaded through the
+    shared HTTP session instead, e.g. from a local `python -m http.server`.
+    """
+
+    LEVELS = ["Very High", "High", "Medium", "Low", "Very Low"]
+
+    def __init__(
+        self,
+        image_path: str = os.path.join(EXAMPLES_DIR, "tree.webp"),
+        latency_ms: float = 0.0,
+        image_url: Optional[str] = None,
+    ):
+        self.image_path = image_path
+        self.latency_ms = latency_ms
+        self.image_url = image_url
+        self._image_bytes: Optional[bytes] = None
+
+    def _delay(self) -> None:
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000.0)
+
+    def plant_info(self, text: str) -> Dict[str, Any]:
+        self._delay()
+        name = normalize_plant_name(text).title() or "Tree"
+        digest = hashlib.sha256(name.encode("utf-8")).digest()
+        levels = [self.LEVELS[b % len(self.LEVELS)] for b in digest[:3]]
+        return {
+            "plant": {
+                "name": name,
+                "scientific name": "",
+                "instructions": {
+                    "watering frequency": "Once a week",
+                    "pruning schedule": "Once a year in late winter",
+                },
+                "benefits": {
+                    "carbon sequestration": levels[0],
+                    "oxygen production": levels[1],
+                    "temperature regulation": levels[2],
+                    "air quality improvement": "Filters particulate matter",
+                    "other benefits": "Provides shade and habitat",
+                },
+            }
+        }
+
+    def plant_image(self, plant_name: str) -> bytes:
+        self._delay()
+        if self.image_url is not None:
+            response = fetch(self.image_url)
+            response.raise_for_status()
+            return response.content
+        if self._image_bytes is None:
+            image = BytesIO()
+            Image.open(self.image_path).save(image, format="PNG")
+            self._image_bytes = image.getvalue()
+        return self._image_bytes
+
+
+def create_provider(offline: bool = False) -> Any:
+    name = os.getenv("GREENSPACE_PROVIDER", "local" if offline else "openai")
+    if name == "openai":
+        return OpenAIProvider()
+    if name == "local":
+        return LocalProvider(
+            latency_ms=float(os.getenv("LOCAL_PROVIDER_LATENCY_MS", "0")),
+            image_url=os.getenv("LOCAL_PROVIDER_IMAGE_URL"),
+        )
+    raise ValueError(f"Unknown provider: {name}")
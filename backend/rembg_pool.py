@@ -0,0 +1,93 @@
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional
+
+import PIL.Image
+from PIL import Image
+
+
+class RembgSessionPool:
+    """A fixed set of pre-warmed rembg sessions shared by all requests.
+
+    Creating a session loads the U^2-Net ONNX model, so sessions are built
+    once and checked out per call instead of being created per request.
+    """
+
+    def __init__(self, size: Optional[int] = None, model_name: str = "u2net"):
+        self.size = size or os.cpu_count() or 1
+        self.model_name = model_name
+        self._sessions: "queue.Queue[Any]" = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _new_session(self) -> Any:
+        # onnxruntime is slow to import; keep it on the warmup thread
+        import rembg
+
+        session = rembg.new_session(self.model_name)
+        # the first inference initializes the onnxruntime graph
+        rembg.remove(Image.new("RGB", (32, 32)), session=session)
+        return session
+
+    def _grow(self) -> bool:
+        with self._lock:
+            if self._created >= self.size:
+                return False
+            self._created += 1
+            return True
+
+    def _build(self) -> Any:
+        try:
+            return self._new_session()
+        except BaseException:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def warmup(self) -> None:
+        while self._grow():
+            self._sessions.put(self._build())
+        logging.info(f"Created {self.size} rembg sessions")
+
+    def warmup_async(self) -> threading.Thread:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self.warmup, name="rembg-pool", daemon=True
+            )
+            self._thread.start()
+        return self._thread
+
+    @contextmanager
+    def session(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        try:
+            session = self._sessions.get_nowait()
+        except queue.Empty:
+            # build on demand if warmup hasn't reached the pool size yet
+            if self._grow():
+                session = self._build()
+            else:
+                session = self._sessions.get(timeout=timeout)
+        try:
+            yield session
+        finally:
+            self._sessions.put(session)
+
+    def remove_background(
+        self, image: PIL.Image.Image, **kwargs
+    ) -> PIL.Image.Image:
+        from tsr.utils import remove_background
+
+        with self.session() as session:
+            return remove_background(image, session, **kwargs)
+
+    def remove_background_batch(
+        self, images: List[PIL.Image.Image], **kwargs
+    ) -> List[PIL.Image.Image]:
+        from tsr.utils import remove_background_batch
+
+        with self.session() as session:
+            return remove_background_batch(images, session, **kwargs)
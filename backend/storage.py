@@ -0,0 +1,105 @@
+import os
+import shutil
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+class FilesystemS3Client:
+    """A local stand-in for the boto3 S3 client that stores objects on disk.
+
+    Objects land in `<root>/<bucket>/<key>`. `latency_ms` adds a fixed delay
+    per request so upload concurrency can be benchmarked offline.
+    """
+
+    def __init__(self, root: str, latency_ms: float = 0.0):
+        self.root = root
+        self.latency_ms = latency_ms
+
+    def _path(self, bucket: str, key: str) -> str:
+        path = os.path.join(self.root, bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def _delay(self) -> None:
+        if self.latency_ms > 0:
+            time.sleep(self.latency_ms / 1000.0)
+
+    def upload_file(
+        self,
+        Filename: str,
+        Bucket: str,
+        Key: str,
+        ExtraArgs: Optional[dict] = None,
+        Callback: Any = None,
+        Config: Any = None,
+    ) -> None:
+        self._delay()
+        shutil.copyfile(Filename, self._path(Bucket, Key))
+
+    def upload_fileobj(
+        self,
+        Fileobj: Any,
+        Bucket: str,
+        Key: str,
+        ExtraArgs: Optional[dict] = None,
+        Callback: Any = None,
+        Config: Any = None,
+    ) -> None:
+        self._delay()
+        with open(self._path(Bucket, Key), "wb") as f:
+            shutil.copyfileobj(Fileobj, f)
+
+    def url(self, bucket: str, key: str) -> str:
+        return "file://" + os.path.abspath(os.path.join(self.root, bucket, key))
+
+
+class LazyClient:
+    """Defers building a client, and importing its SDK, to the first call."""
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._client: Any = None
+        self._lock = threading.Lock()
+
+    def _get(self) -> Any:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get(), name)
+
+
+def create_s3_client(offline: bool = False) -> Any:
+    """OBJECT_STORE_DIR (default `object_store/` when offline) selects the
+    filesystem store, S3_ENDPOINT_URL points boto3 at an S3-compatible server
+    such as minio. The boto3 client, and boto3 itself, are only created on
+    the first upload."""
+    store_dir = os.getenv("OBJECT_STORE_DIR", "object_store" if offline else "")
+    if store_dir:
+        return FilesystemS3Client(
+            store_dir, latency_ms=float(os.getenv("OBJECT_STORE_LATENCY_MS", "0"))
+        )
+
+    def boto3_client() -> Any:
+        import boto3
+
+        return boto3.client(
+            "s3",
+            endpoint_url=os.getenv("S3_ENDPOINT_URL"),
+            aws_access_key_id=os.getenv("AWS_ACCESS_KEY"),
+            aws_secret_access_key=os.getenv("AWS_SECRET_KEY"),
+        )
+
+    return LazyClient(boto3_client)
+
+
+def object_url(client: Any, bucket: str, key: str) -> str:
+    if isinstance(client, FilesystemS3Client):
+        return client.url(bucket, key)
+    if os.getenv("S3_ENDPOINT_URL"):
+        return f"{os.getenv('S3_ENDPOINT_URL').rstrip('/')}/{bucket}/{key}"
+    return f"https://{bucket}.s3.amazonaws.com/{key}"
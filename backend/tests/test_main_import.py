@@ -0,0 +1,113 @@
+"""`import main` must succeed, both in the server and in a spawned CPU pool
+worker. Each case imports it in a fresh interpreter, so module-level
+ordering mistakes fail here rather than on server start."""
+
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# background loaders (model, rembg, CPU pool) would pull in torch and rembg;
+# this only checks that the module itself imports
+SERVER = """
+import json, threading
+threading.Thread.start = lambda self: None
+import main
+print(json.dumps({
+    "healthz": main.app.test_client().get("/healthz").status_code,
+    "services": hasattr(main, "job_queue"),
+}))
+"""
+
+PARAMS = """
+import json, threading
+threading.Thread.start = lambda self: None
+import main
+client = main.app.test_client()
+print(json.dumps({
+    "strings": main.parse_generation_params(
+        {"bake_texture": "false", "mc_resolution": "128"}
+    ),
+    "clamped": main.parse_generation_params(
+        {"mc_resolution": 100000, "texture_resolution": 1}
+    ),
+    "invalid": [
+        client.post("/process", json={"text": "fern", **data}).status_code
+        for data in (
+            {"mc_resolution": None},
+            {"mc_resolution": "high"},
+            {"bake_texture": "maybe"},
+            {"preview": [1]},
+        )
+    ],
+}))
+"""
+
+# what a spawned worker does: re-run main.py under the name __mp_main__
+WORKER = """
+import json, runpy
+namespace = runpy.run_path("main.py", run_name="__mp_main__")
+print(json.dumps({"services": "job_queue" in namespace}))
+"""
+
+
+def run(code, tmp_path, **env):
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACKEND_DIR if code is WORKER else tmp_path,
+        env=dict(
+            os.environ,
+            PYTHONPATH=BACKEND_DIR,
+            ASSET_CACHE_INDEX=os.path.join(tmp_path, "assets.json"),
+            PLANT_INDEX=os.path.join(tmp_path, "plants.json"),
+            SCENE_STORE_DIR=os.path.join(tmp_path, "scene_codes"),
+            **env,
+        ),
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_offline(tmp_path):
+    result = run(
+        SERVER,
+        str(tmp_path),
+        GREENSPACE_OFFLINE="1",
+        OBJECT_STORE_DIR=str(tmp_path / "object_store"),
+    )
+    assert result == {"healthz": 200, "services": True}
+
+
+def test_import_online(tmp_path):
+    result = run(
+        SERVER,
+        str(tmp_path),
+        GREENSPACE_OFFLINE="0",
+        GREENSPACE_PROVIDER="openai",
+        OBJECT_STORE_DIR="",
+    )
+    assert result == {"healthz": 200, "services": True}
+
+
+def test_import_as_cpu_pool_worker(tmp_path):
+    result = run(WORKER, str(tmp_path), GREENSPACE_OFFLINE="1")
+    assert result == {"services": False}
+
+
+def test_generation_params(tmp_path):
+    result = run(
+        PARAMS,
+        str(tmp_path),
+        GREENSPACE_OFFLINE="1",
+        OBJECT_STORE_DIR=str(tmp_path / "object_store"),
+    )
+    assert result["strings"]["bake_texture"] is False
+    assert result["strings"]["mc_resolution"] == 128
+    assert result["clamped"]["mc_resolution"] == 512
+    assert result["clamped"]["texture_resolution"] == 256
+    assert result["invalid"] == [400, 400, 400, 400]
@@ -0,0 +1,127 @@
+import itertools
+import logging
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from metrics import (
+    STAGE_LATENCY,
+    STAGE_PEAK_CUDA_MEMORY,
+    STAGE_PEAK_RSS,
+    current_rss_bytes,
+)
+
+
+def _cuda_torch():
+    # torch is imported lazily elsewhere; until something has imported it
+    # there is no GPU work to wait for
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        return torch
+    return None
+
+
+class _StageMemory:
+    """Process-wide memory tracking for the stages that are open.
+
+    RSS is sampled on a background thread while any stage is open, so each
+    stage gets the highest RSS seen while it ran, not just at its end. The
+    CUDA peak counter is device-wide: it is only reset when a stage opens
+    with no other stage open anywhere in the process, so overlapping stages
+    (the batcher and job threads) never reset it under each other. A stage
+    that overlapped others reports the peak since the earliest of them began.
+    """
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self._ids = itertools.count()
+        self._peaks: Dict[int, int] = {}
+        self._changed = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def open(self, torch=None) -> int:
+        rss = current_rss_bytes()
+        with self._changed:
+            if torch is not None and not self._peaks:
+                torch.cuda.reset_peak_memory_stats()
+            token = next(self._ids)
+            self._peaks[token] = rss
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._sample, name="stage-memory", daemon=True
+                )
+                self._thread.start()
+            self._changed.notify_all()
+        return token
+
+    def close(self, token: int) -> int:
+        rss = current_rss_bytes()
+        with self._changed:
+            return max(self._peaks.pop(token, rss), rss)
+
+    def _sample(self) -> None:
+        while True:
+            with self._changed:
+                while not self._peaks:
+                    self._changed.wait()
+            rss = current_rss_bytes()
+            with self._changed:
+                for token, peak in self._peaks.items():
+                    self._peaks[token] = max(peak, rss)
+            time.sleep(self.interval)
+
+
+_stage_memory = _StageMemory()
+
+
+class Timer:
+    def __init__(
+        self,
+        on_start: Optional[Callable[[str], None]] = None,
+        on_end: Optional[Callable[[str, float], None]] = None,
+    ):
+        self.items = {}
+        self._memory_tokens = {}
+        self.time_scale = 1000.0  # ms
+        self.time_unit = "ms"
+        self.on_start = on_start
+        self.on_end = on_end
+
+    def start(self, name: str) -> None:
+        torch = _cuda_torch()
+        if torch is not None:
+            torch.cuda.synchronize()
+        if name in self._memory_tokens:
+            # restarted without end(); don't leave the old stage open
+            _stage_memory.close(self._memory_tokens.pop(name))
+        self._memory_tokens[name] = _stage_memory.open(torch)
+        self.items[name] = time.time()
+        logging.info(f"{name} ...")
+        if self.on_start is not None:
+            self.on_start(name)
+
+    def end(self, name: str) -> float:
+        if name not in self.items:
+            return
+        torch = _cuda_torch()
+        if torch is not None:
+            torch.cuda.synchronize()
+        start_time = self.items.pop(name)
+        delta = time.time() - start_time
+        t = delta * self.time_scale
+        logging.info(f"{name} finished in {t:.2f}{self.time_unit}.")
+        STAGE_LATENCY.observe(delta, stage=name)
+        peak_rss = _stage_memory.close(self._memory_tokens.pop(name))
+        STAGE_PEAK_RSS.set_max(peak_rss, stage=name)
+        if torch is not None:
+            STAGE_PEAK_CUDA_MEMORY.set_max(torch.cuda.max_memory_allocated(), stage=name)
+        if self.on_end is not None:
+            self.on_end(name, t)
+        return t
+
+    def __del__(self):
+        # stages a failed job never ended would otherwise stay open, keeping
+        # the sampler busy and the CUDA peak from ever being reset again
+        for token in self._memory_tokens.values():
+            _stage_memory.close(token)
@@ -1,12 +1,15 @@
 import numpy as np
 import torch
-import xatlas
 import trimesh
-import moderngl
 from PIL import Image
 
+# xatlas and moderngl are only needed when a texture is baked, and moderngl
+# pulls in OpenGL bindings, so both are imported on first use
+
 
 def make_atlas(mesh, texture_resolution, texture_padding):
+    import xatlas
+
     atlas = xatlas.Atlas()
     atlas.add_mesh(mesh.vertices, mesh.faces)
     options = xatlas.PackOptions()
@@ -25,6 +28,8 @@ def make_atlas(mesh, texture_resolution, texture_padding):
 def rasterize_position_atlas(
     mesh, atlas_vmapping, atlas_indices, atlas_uvs, texture_resolution, texture_padding
 ):
+    import moderngl
+
     ctx = moderngl.create_context(standalone=True)
     basic_prog = ctx.program(
         vertex_shader="""
@@ -148,9 +153,9 @@ def positions_to_colors(model, scene_code, positions_texture, texture_resolution
     return rgba_f.reshape(texture_resolution, texture_resolution, 4)
 
 
-def bake_texture(mesh, model, scene_code, texture_resolution):
+def bake_texture(mesh, model, scene_code, texture_resolution, make_atlas_fn=make_atlas):
     texture_padding = round(max(2, texture_resolution / 256))
-    atlas = make_atlas(mesh, texture_resolution, texture_padding)
+    atlas = make_atlas_fn(mesh, texture_resolution, texture_padding)
     positions_texture = rasterize_position_atlas(
         mesh,
         atlas["vmapping"],
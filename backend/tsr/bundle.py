@@ -0,0 +1,134 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from typing import Any, Dict
+
+from huggingface_hub import hf_hub_download
+from omegaconf import OmegaConf
+
+from .weights import SAFETENSORS_EXT, convert, find_weights
+
+BUNDLE_MANIFEST = "manifest.json"
+BUNDLE_CONFIG = "config.yaml"
+BUNDLE_WEIGHTS = "model" + SAFETENSORS_EXT
+BUNDLE_IMAGE_TOKENIZER = "image_tokenizer"
+BUNDLE_FORMAT = 1
+
+
+def is_bundle(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, BUNDLE_MANIFEST))
+
+
+def _resolve_file(name_or_path: str, filename: str) -> str:
+    if os.path.isdir(name_or_path):
+        return os.path.join(name_or_path, filename)
+    return hf_hub_download(repo_id=name_or_path, filename=filename)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_bundle(
+    pretrained_model_name_or_path: str,
+    output_dir: str,
+    config_name: str = "config.yaml",
+    weight_name: str = "model.ckpt",
+) -> str:
+    """Write everything needed to build TSR into `output_dir`: the resolved
+    config, the ViT config of the image tokenizer, the weights as safetensors
+    and a manifest with their hashes. `TSR.from_bundle` builds the model from
+    it without network access. Anything on the Hub is downloaded here, once.
+    """
+    cfg = OmegaConf.load(_resolve_file(pretrained_model_name_or_path, config_name))
+    OmegaConf.resolve(cfg)
+    weight_path = _resolve_file(pretrained_model_name_or_path, weight_name)
+    if os.path.isdir(pretrained_model_name_or_path):
+        weight_path = find_weights(weight_path)
+    vit_config_path = _resolve_file(
+        cfg.image_tokenizer.pretrained_model_name_or_path, "config.json"
+    )
+
+    os.makedirs(os.path.join(output_dir, BUNDLE_IMAGE_TOKENIZER), exist_ok=True)
+    # the manifest marks a complete bundle, so drop a stale one first
+    if is_bundle(output_dir):
+        os.remove(os.path.join(output_dir, BUNDLE_MANIFEST))
+    shutil.copyfile(
+        vit_config_path,
+        os.path.join(output_dir, BUNDLE_IMAGE_TOKENIZER, "config.json"),
+    )
+    # relative to the bundle, so it can be copied or mounted anywhere
+    cfg.image_tokenizer.pretrained_model_name_or_path = BUNDLE_IMAGE_TOKENIZER
+    OmegaConf.save(cfg, os.path.join(output_dir, BUNDLE_CONFIG))
+    if weight_path.endswith(SAFETENSORS_EXT):
+        shutil.copyfile(weight_path, os.path.join(output_dir, BUNDLE_WEIGHTS))
+    else:
+        convert(weight_path, os.path.join(output_dir, BUNDLE_WEIGHTS))
+
+    files = [
+        BUNDLE_CONFIG,
+        os.path.join(BUNDLE_IMAGE_TOKENIZER, "config.json"),
+        BUNDLE_WEIGHTS,
+    ]
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "source": pretrained_model_name_or_path,
+        "files": {
+            name: {
+                "sha256": _sha256(os.path.join(output_dir, name)),
+                "bytes": os.path.getsize(os.path.join(output_dir, name)),
+            }
+            for name in files
+        },
+    }
+    with open(os.path.join(output_dir, BUNDLE_MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=4)
+    return output_dir
+
+
+def read_manifest(bundle_dir: str, verify: bool = False) -> Dict[str, Any]:
+    """The bundle's manifest; with `verify`, also check every file against
+    its recorded hash. Raises ValueError for an incomplete or corrupt bundle."""
+    manifest_path = os.path.join(bundle_dir, BUNDLE_MANIFEST)
+    if not os.path.isfile(manifest_path):
+        raise ValueError(f"{bundle_dir} is not a complete model bundle")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported model bundle format: {manifest.get('format')}")
+    for name, expected in manifest["files"].items():
+        path = os.path.join(bundle_dir, name)
+        if not os.path.isfile(path) or os.path.getsize(path) != expected["bytes"]:
+            raise ValueError(f"Model bundle file is missing or truncated: {path}")
+        if verify and _sha256(path) != expected["sha256"]:
+            raise ValueError(f"Model bundle file does not match its hash: {path}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export a TSR model to a self-contained bundle for offline loading."
+    )
+    parser.add_argument("model", type=str, help="Hub repo id or local model directory.")
+    parser.add_argument("output_dir", type=str)
+    parser.add_argument("--config-name", type=str, default="config.yaml")
+    parser.add_argument("--weight-name", type=str, default="model.ckpt")
+    args = parser.parse_args()
+    print(
+        export_bundle(
+            args.model,
+            args.output_dir,
+            config_name=args.config_name,
+            weight_name=args.weight_name,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+import trimesh
+
+
+def nearest_distances(
+    a: torch.Tensor, b: torch.Tensor, chunk_size: int = 4096
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Distance from each point of `a` to its nearest point in `b`, and that
+    point's index."""
+    dists, indices = [], []
+    for i in range(0, a.shape[0], chunk_size):
+        d = torch.cdist(a[i : i + chunk_size], b)
+        dist, index = d.min(dim=1)
+        dists.append(dist)
+        indices.append(index)
+    return torch.cat(dists), torch.cat(indices)
+
+
+def compare_meshes(
+    reference: trimesh.Trimesh,
+    candidate: trimesh.Trimesh,
+    n_points: int = 20000,
+    f_score_tau: float = 0.01,
+    seed: int = 0,
+) -> Dict[str, float]:
+    """Geometric and color agreement of `candidate` with `reference`.
+
+    Distances are relative to the reference bounding box diagonal, so the
+    numbers don't depend on the mesh scale:
+
+    - chamfer: mean distance between surface samples, both directions
+    - hausdorff: largest such distance
+    - f_score: harmonic mean of the fractions of samples within
+      `f_score_tau` of the other surface
+    - color_error: mean absolute RGB difference (0-1) between each reference
+      vertex and the nearest candidate vertex, if both have vertex colors
+    """
+    if len(reference.faces) == 0 or len(candidate.faces) == 0:
+        return {
+            "chamfer": float("inf"),
+            "hausdorff": float("inf"),
+            "f_score": 0.0,
+            "color_error": float("nan"),
+            "vertex_ratio": len(candidate.vertices) / max(1, len(reference.vertices)),
+        }
+
+    diagonal = float(np.linalg.norm(reference.bounds[1] - reference.bounds[0])) or 1.0
+    ref_points, _ = trimesh.sample.sample_surface(reference, n_points, seed=seed)
+    cand_points, _ = trimesh.sample.sample_surface(candidate, n_points, seed=seed)
+    ref_points = torch.from_numpy(np.asarray(ref_points, dtype=np.float32))
+    cand_points = torch.from_numpy(np.asarray(cand_points, dtype=np.float32))
+
+    ref_to_cand, _ = nearest_distances(ref_points, cand_points)
+    cand_to_ref, _ = nearest_distances(cand_points, ref_points)
+    ref_to_cand, cand_to_ref = ref_to_cand / diagonal, cand_to_ref / diagonal
+
+    precision = (cand_to_ref < f_score_tau).float().mean().item()
+    recall = (ref_to_cand < f_score_tau).float().mean().item()
+    f_score = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+    color_error = float("nan")
+    if reference.visual.kind == "vertex" and candidate.visual.kind == "vertex":
+        _, index = nearest_distances(
+            torch.from_numpy(np.asarray(reference.vertices, dtype=np.float32)),
+            torch.from_numpy(np.asarray(candidate.vertices, dtype=np.float32)),
+        )
+        ref_colors = np.asarray(reference.visual.vertex_colors[:, :3], dtype=np.float32)
+        cand_colors = np.asarray(
+            candidate.visual.vertex_colors[index.numpy(), :3], dtype=np.float32
+        )
+        color_error = float(np.abs(ref_colors - cand_colors).mean() / 255.0)
+
+    return {
+        "chamfer": (ref_to_cand.mean() + cand_to_ref.mean()).item() / 2,
+        "hausdorff": max(ref_to_cand.max().item(), cand_to_ref.max().item()),
+        "f_score": f_score,
+        "color_error": color_error,
+        "vertex_ratio": len(candidate.vertices) / max(1, len(reference.vertices)),
+    }
+
+
+def check_meshes(
+    reference: trimesh.Trimesh,
+    candidate: trimesh.Trimesh,
+    max_chamfer: float = 0.005,
+    min_f_score: float = 0.95,
+    max_color_error: Optional[float] = 0.05,
+) -> Tuple[Dict[str, float], List[str]]:
+    """`compare_meshes` plus the tolerances it failed, as messages.
+
+    An empty mesh on either side fails, and so does a metric that is NaN,
+    e.g. a color error without vertex colors, rather than slipping through
+    a comparison. `max_color_error=None` skips the color check.
+    """
+    metrics = compare_meshes(reference, candidate)
+    failures = []
+    if len(reference.faces) == 0:
+        failures.append("reference mesh is empty")
+    if len(candidate.faces) == 0:
+        failures.append("mesh is empty")
+    if failures:
+        return metrics, failures
+
+    # written so that NaN, which compares False either way, fails too
+    if not metrics["chamfer"] <= max_chamfer:
+        failures.append(f"chamfer {metrics['chamfer']:.5f}")
+    if not metrics["f_score"] >= min_f_score:
+        failures.append(f"f-score {metrics['f_score']:.3f}")
+    if max_color_error is not None and not metrics["color_error"] <= max_color_error:
+        failures.append(f"color error {metrics['color_error']:.4f}")
+    return metrics, failures
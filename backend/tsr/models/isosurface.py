@@ -40,13 +40,15 @@ class MarchingCubeHelper(IsosurfaceHelper):
     def forward(
         self,
         level: torch.FloatTensor,
+        mc_func: Optional[Callable] = None,
     ) -> Tuple[torch.FloatTensor, torch.LongTensor]:
+        mc_func = mc_func or self.mc_func
         level = -level.view(self.resolution, self.resolution, self.resolution)
         try:
-            v_pos, t_pos_idx = self.mc_func(level.detach(), 0.0)
+            v_pos, t_pos_idx = mc_func(level.detach(), 0.0)
         except AttributeError:
             print("torchmcubes was not compiled with CUDA support, use CPU version instead.")
-            v_pos, t_pos_idx = self.mc_func(level.detach().cpu(), 0.0)
+            v_pos, t_pos_idx = mc_func(level.detach().cpu(), 0.0)
         v_pos = v_pos[..., [2, 1, 0]]
         v_pos = v_pos / (self.resolution - 1.0)
         return v_pos.to(level.device), t_pos_idx.to(level.device)
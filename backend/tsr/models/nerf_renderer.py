@@ -31,6 +31,7 @@ class TriplaneNeRFRenderer(BaseModule):
     def configure(self) -> None:
         assert self.cfg.feature_reduction in ["concat", "mean"]
         self.chunk_size = 0
+        self.static_chunks = False
 
     def set_chunk_size(self, chunk_size: int):
         assert (
@@ -38,6 +39,11 @@ class TriplaneNeRFRenderer(BaseModule):
         ), "chunk_size must be a non-negative integer (0 for no chunking)."
         self.chunk_size = chunk_size
 
+    def set_static_chunks(self, static_chunks: bool):
+        # pad the last chunk to chunk_size, so a compiled decoder sees one
+        # input shape and never recompiles
+        self.static_chunks = static_chunks
+
     def query_triplane(
         self,
         decoder: torch.nn.Module,
@@ -74,16 +80,28 @@ class TriplaneNeRFRenderer(BaseModule):
             net_out: Dict[str, torch.Tensor] = decoder(out)
             return net_out
 
-        if self.chunk_size > 0:
+        def _query_padded_chunk(x):
+            n = x.shape[0]
+            if n == self.chunk_size:
+                return _query_chunk(x)
+            x = torch.cat([x, x.new_zeros(self.chunk_size - n, x.shape[1])])
+            return {k: v[:n] for k, v in _query_chunk(x).items()}
+
+        if self.chunk_size > 0 and self.static_chunks:
+            net_out = chunk_batch(_query_padded_chunk, self.chunk_size, positions)
+        elif self.chunk_size > 0:
             net_out = chunk_batch(_query_chunk, self.chunk_size, positions)
         else:
             net_out = _query_chunk(positions)
 
+        # the decoder may have run under autocast; activations are fp32, exp
+        # of a half-precision density overflows (trunc_exp, the default,
+        # also casts to fp32 itself)
         net_out["density_act"] = get_activation(self.cfg.density_activation)(
-            net_out["density"] + self.cfg.density_bias
+            net_out["density"].float() + self.cfg.density_bias
         )
         net_out["color"] = get_activation(self.cfg.color_activation)(
-            net_out["features"]
+            net_out["features"].float()
         )
 
         net_out = {k: v.view(*input_shape, -1) for k, v in net_out.items()}
@@ -123,21 +141,26 @@ class TriplaneNeRFRenderer(BaseModule):
         )
 
         eps = 1e-10
-        # deltas = z_vals[:, 1:] - z_vals[:, :-1] # (N_rays, N_samples)
-        deltas = t_vals[1:] - t_vals[:-1]  # (N_rays, N_samples)
-        alpha = 1 - torch.exp(
-            -deltas * mlp_out["density_act"][..., 0]
-        )  # (N_rays, N_samples)
-        accum_prod = torch.cat(
-            [
-                torch.ones_like(alpha[:, :1]),
-                torch.cumprod(1 - alpha[:, :-1] + eps, dim=-1),
-            ],
-            dim=-1,
-        )
-        weights = alpha * accum_prod  # (N_rays, N_samples)
-        comp_rgb_ = (weights[..., None] * mlp_out["color"]).sum(dim=-2)  # (N_rays, 3)
-        opacity_ = weights.sum(dim=-1)  # (N_rays)
+        # compositing stays in fp32 under autocast: the transmittance cumprod
+        # over all samples of a ray underflows in half precision
+        with torch.autocast(device_type=triplane.device.type, enabled=False):
+            # deltas = z_vals[:, 1:] - z_vals[:, :-1] # (N_rays, N_samples)
+            deltas = t_vals[1:] - t_vals[:-1]  # (N_rays, N_samples)
+            alpha = 1 - torch.exp(
+                -deltas * mlp_out["density_act"][..., 0].float()
+            )  # (N_rays, N_samples)
+            accum_prod = torch.cat(
+                [
+                    torch.ones_like(alpha[:, :1]),
+                    torch.cumprod(1 - alpha[:, :-1] + eps, dim=-1),
+                ],
+                dim=-1,
+            )
+            weights = alpha * accum_prod  # (N_rays, N_samples)
+            comp_rgb_ = (weights[..., None] * mlp_out["color"].float()).sum(
+                dim=-2
+            )  # (N_rays, 3)
+            opacity_ = weights.sum(dim=-1)  # (N_rays)
 
         comp_rgb = torch.zeros(
             n_rays, 3, dtype=comp_rgb_.dtype, device=comp_rgb_.device
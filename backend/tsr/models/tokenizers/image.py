@@ -1,3 +1,4 @@
+import os
 from dataclasses import dataclass
 
 import torch
@@ -18,13 +19,17 @@ class DINOSingleImageTokenizer(BaseModule):
     cfg: Config
 
     def configure(self) -> None:
-        self.model: ViTModel = ViTModel(
-            ViTModel.config_class.from_pretrained(
-                hf_hub_download(
-                    repo_id=self.cfg.pretrained_model_name_or_path,
-                    filename="config.json",
-                )
+        if os.path.isdir(self.cfg.pretrained_model_name_or_path):
+            config_path = os.path.join(
+                self.cfg.pretrained_model_name_or_path, "config.json"
+            )
+        else:
+            config_path = hf_hub_download(
+                repo_id=self.cfg.pretrained_model_name_or_path,
+                filename="config.json",
             )
+        self.model: ViTModel = ViTModel(
+            ViTModel.config_class.from_pretrained(config_path)
         )
 
         if self.cfg.enable_gradient_checkpointing:
@@ -36,7 +36,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-from typing import Optional
+from typing import List, Optional
 
 import torch
 import torch.nn.functional as F
@@ -448,37 +448,69 @@ class Attention(nn.Module):
 
     @torch.no_grad()
     def fuse_projections(self, fuse=True):
-        is_cross_attention = self.cross_attention_dim != self.query_dim
-        device = self.to_q.weight.data.device
-        dtype = self.to_q.weight.data.dtype
+        r"""
+        Fuse the query, key and value projections into one `to_qkv` layer (self-attention) and the key and value
+        projections into one `to_kv` layer, so the processors run one matmul instead of three or two. Biases are
+        fused too. The separate projections are re-pointed at slices of the fused weights, so no second copy is
+        kept; fuse after moving the module to its device and dtype.
 
-        if not is_cross_attention:
-            # fetch weight matrices.
-            concatenated_weights = torch.cat(
-                [self.to_q.weight.data, self.to_k.weight.data, self.to_v.weight.data]
-            )
-            in_features = concatenated_weights.shape[1]
-            out_features = concatenated_weights.shape[0]
+        Args:
+            fuse (`bool`, *optional*, defaults to `True`):
+                Whether the processors should use the fused projections.
+        """
+        if not fuse:
+            self.fused_projections = False
+            return
 
-            # create a new single projection layer and copy over the weights.
-            self.to_qkv = self.linear_cls(
-                in_features, out_features, bias=False, device=device, dtype=dtype
-            )
-            self.to_qkv.weight.copy_(concatenated_weights)
+        is_cross_attention = self.cross_attention_dim != self.query_dim
+        projections = [self.to_k, self.to_v]
+        if not is_cross_attention:
+            projections.insert(0, self.to_q)
+        fused = self._fuse_linear(projections)
 
+        if is_cross_attention:
+            self.to_kv = fused
         else:
-            concatenated_weights = torch.cat(
-                [self.to_k.weight.data, self.to_v.weight.data]
-            )
-            in_features = concatenated_weights.shape[1]
-            out_features = concatenated_weights.shape[0]
-
-            self.to_kv = self.linear_cls(
-                in_features, out_features, bias=False, device=device, dtype=dtype
+            self.to_qkv = fused
+            # the key and value rows of to_qkv, for calls with encoder_hidden_states
+            self.to_kv = self._linear_from_slice(fused, self.inner_dim, fused.out_features)
+
+        self.fused_projections = True
+
+    def _fuse_linear(self, projections: List[nn.Linear]) -> nn.Linear:
+        weight = torch.cat([projection.weight for projection in projections])
+        fused = self.linear_cls(
+            weight.shape[1],
+            weight.shape[0],
+            bias=projections[0].bias is not None,
+            device="meta",
+        )
+        fused.weight = nn.Parameter(weight)
+        if fused.bias is not None:
+            fused.bias = nn.Parameter(
+                torch.cat([projection.bias for projection in projections])
             )
-            self.to_kv.weight.copy_(concatenated_weights)
 
-        self.fused_projections = fuse
+        start = 0
+        for projection in projections:
+            end = start + projection.out_features
+            projection.weight = nn.Parameter(fused.weight[start:end])
+            if projection.bias is not None:
+                projection.bias = nn.Parameter(fused.bias[start:end])
+            start = end
+        return fused
+
+    def _linear_from_slice(self, linear: nn.Linear, start: int, end: int) -> nn.Linear:
+        sliced = self.linear_cls(
+            linear.in_features,
+            end - start,
+            bias=linear.bias is not None,
+            device="meta",
+        )
+        sliced.weight = nn.Parameter(linear.weight[start:end])
+        if linear.bias is not None:
+            sliced.bias = nn.Parameter(linear.bias[start:end])
+        return sliced
 
 
 class AttnProcessor:
@@ -517,17 +549,23 @@ class AttnProcessor:
                 1, 2
             )
 
-        query = attn.to_q(hidden_states)
+        if attn.fused_projections and encoder_hidden_states is None:
+            query, key, value = attn.to_qkv(hidden_states).chunk(3, dim=-1)
+        else:
+            query = attn.to_q(hidden_states)
 
-        if encoder_hidden_states is None:
-            encoder_hidden_states = hidden_states
-        elif attn.norm_cross:
-            encoder_hidden_states = attn.norm_encoder_hidden_states(
-                encoder_hidden_states
-            )
+            if encoder_hidden_states is None:
+                encoder_hidden_states = hidden_states
+            elif attn.norm_cross:
+                encoder_hidden_states = attn.norm_encoder_hidden_states(
+                    encoder_hidden_states
+                )
 
-        key = attn.to_k(encoder_hidden_states)
-        value = attn.to_v(encoder_hidden_states)
+            if attn.fused_projections:
+                key, value = attn.to_kv(encoder_hidden_states).chunk(2, dim=-1)
+            else:
+                key = attn.to_k(encoder_hidden_states)
+                value = attn.to_v(encoder_hidden_states)
 
         query = attn.head_to_batch_dim(query)
         key = attn.head_to_batch_dim(key)
@@ -604,17 +642,23 @@ class AttnProcessor2_0:
                 1, 2
             )
 
-        query = attn.to_q(hidden_states)
+        if attn.fused_projections and encoder_hidden_states is None:
+            query, key, value = attn.to_qkv(hidden_states).chunk(3, dim=-1)
+        else:
+            query = attn.to_q(hidden_states)
 
-        if encoder_hidden_states is None:
-            encoder_hidden_states = hidden_states
-        elif attn.norm_cross:
-            encoder_hidden_states = attn.norm_encoder_hidden_states(
-                encoder_hidden_states
-            )
+            if encoder_hidden_states is None:
+                encoder_hidden_states = hidden_states
+            elif attn.norm_cross:
+                encoder_hidden_states = attn.norm_encoder_hidden_states(
+                    encoder_hidden_states
+                )
 
-        key = attn.to_k(encoder_hidden_states)
-        value = attn.to_v(encoder_hidden_states)
+            if attn.fused_projections:
+                key, value = attn.to_kv(encoder_hidden_states).chunk(2, dim=-1)
+            else:
+                key = attn.to_k(encoder_hidden_states)
+                value = attn.to_v(encoder_hidden_states)
 
         inner_dim = key.shape[-1]
         head_dim = inner_dim // attn.heads
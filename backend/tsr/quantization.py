@@ -0,0 +1,52 @@
+from typing import TYPE_CHECKING, Sequence, Tuple
+
+import torch
+import torch.nn as nn
+from omegaconf import OmegaConf
+
+if TYPE_CHECKING:
+    from .system import TSR
+
+QUANTIZED_MODULES: Tuple[str, ...] = ("backbone", "decoder")
+
+
+def quantize_dynamic_int8(
+    model: "TSR", modules: Sequence[str] = QUANTIZED_MODULES
+) -> "TSR":
+    """Swap the `nn.Linear` layers of `modules` for dynamic int8 ones, in
+    place. Weights are stored as int8 and activations are quantized per
+    batch at run time, so no calibration data is needed. CPU only; run
+    inference in fp32 (the quantized kernels don't take autocast inputs).
+    """
+    for name in modules:
+        torch.ao.quantization.quantize_dynamic(
+            getattr(model, name), {nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+    model.quantized_modules = list(modules)
+    return model
+
+
+def save_quantized(model: "TSR", path: str) -> None:
+    """Save a quantized model with its resolved config, so that
+    `load_quantized` needs neither the config nor the fp32 checkpoint."""
+    torch.save(
+        {
+            "config": OmegaConf.to_container(model.cfg, resolve=True),
+            "quantization": {"dtype": "qint8", "modules": model.quantized_modules},
+            "state_dict": model.state_dict(),
+        },
+        path,
+    )
+
+
+def load_quantized(path: str) -> "TSR":
+    from .system import TSR
+
+    # packed int8 weights aren't plain tensors, so this can't be weights_only
+    artifact = torch.load(path, map_location="cpu", weights_only=False)
+    model = TSR(artifact["config"])
+    # quantize the freshly initialized modules to get the same structure,
+    # then load the stored int8 weights over them
+    quantize_dynamic_int8(model, artifact["quantization"]["modules"])
+    model.load_state_dict(artifact["state_dict"])
+    return model
@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Optional, Union
+
+import numpy as np
+import PIL.Image
+
+if TYPE_CHECKING:
+    import torch
+
+
+class SceneCodeStore:
+    """Triplane scene codes on disk, keyed by a hash of the input image.
+
+    `TSR.forward` is the expensive part of a generation; with the codes kept,
+    `extract_mesh`, `render` and `bake_texture` can run again at another
+    resolution or threshold without the image tokenizer and backbone. Codes
+    are stored as .npy (float32 by default; float16 halves the size but
+    rounds the codes) and loaded as copy-on-write memory maps, so a float32
+    store read on CPU is zero-copy. At most `max_entries` codes are kept; the
+    least recently used go first, tracked by file mtime so the order survives
+    restarts. torch is only imported by `save` and `load`, so creating a
+    store doesn't pull it onto the server's import path.
+    """
+
+    def __init__(self, root: str, dtype: str = "float32", max_entries: int = 1000):
+        self.root = root
+        self.dtype = np.dtype(dtype)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def key(image: Union[PIL.Image.Image, np.ndarray], **params: Any) -> str:
+        """Hash of the pixels plus anything else the codes depend on: the
+        preprocessing parameters, e.g. `foreground_ratio`, and the model's
+        weights, precision and quantization, e.g. `ModelRegistry.identity()`."""
+        if isinstance(image, PIL.Image.Image):
+            header = f"{image.mode}:{image.size}"
+            data = image.tobytes()
+        else:
+            image = np.ascontiguousarray(image)
+            header = f"{image.dtype}:{image.shape}"
+            data = image.tobytes()
+        digest = hashlib.sha256(header.encode("utf-8"))
+        digest.update(data)
+        for name in sorted(params):
+            digest.update(f"{name}={params[name]!r}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.npy")
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def save(self, key: str, scene_code: "torch.Tensor") -> str:
+        import torch
+
+        array = scene_code.detach().to("cpu", torch.float32).numpy().astype(self.dtype)
+        # write-then-rename so a reader never maps a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".", suffix=".npy")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, self.path(key))
+        with self._lock:
+            self._entries[key] = None
+            self._entries.move_to_end(key)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+        for evicted_key in evicted:
+            try:
+                os.remove(self.path(evicted_key))
+            except FileNotFoundError:
+                pass
+            logging.info(f"Evicted scene code {evicted_key} from scene store")
+        return self.path(key)
+
+    def load(
+        self, key: str, device: Optional[str] = None
+    ) -> Optional["torch.FloatTensor"]:
+        """The stored code as a batch of one, or None if there isn't one."""
+        import torch
+
+        try:
+            array = np.load(self.path(key), mmap_mode="c")
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        with self._lock:
+            self._entries[key] = None
+            self._entries.move_to_end(key)
+        # mtime is the recency order on the next start
+        try:
+            os.utime(self.path(key))
+        except FileNotFoundError:
+            pass
+        scene_code = torch.from_numpy(array)
+        if device is not None:
+            scene_code = scene_code.to(device)
+        return scene_code.float().unsqueeze(0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load(self) -> None:
+        entries = []
+        for name in os.listdir(self.root):
+            # skip the temporary files of interrupted saves
+            if not name.endswith(".npy") or name.startswith("."):
+                continue
+            try:
+                entries.append((os.path.getmtime(os.path.join(self.root, name)), name))
+            except FileNotFoundError:
+                continue
+        for _, name in sorted(entries):
+            self._entries[name[: -len(".npy")]] = None
+        while len(self._entries) > self.max_entries:
+            key, _ = self._entries.popitem(last=False)
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
@@ -1,7 +1,8 @@
 import math
 import os
+import threading
 from dataclasses import dataclass, field
-from typing import List, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import numpy as np
 import PIL.Image
@@ -13,14 +14,25 @@ from huggingface_hub import hf_hub_download
 from omegaconf import OmegaConf
 from PIL import Image
 
+from .bundle import (
+    BUNDLE_CONFIG,
+    BUNDLE_IMAGE_TOKENIZER,
+    BUNDLE_WEIGHTS,
+    is_bundle,
+    read_manifest,
+)
 from .models.isosurface import MarchingCubeHelper
+from .models.transformer.attention import Attention
 from .utils import (
     BaseModule,
     ImagePreprocessor,
+    autocast,
     find_class,
     get_spherical_cameras,
+    resolve_precision,
     scale_tensor,
 )
+from .weights import find_weights, load_state_dict
 
 
 class TSR(BaseModule):
@@ -52,9 +64,13 @@ class TSR(BaseModule):
     def from_pretrained(
         cls, pretrained_model_name_or_path: str, config_name: str, weight_name: str
     ):
+        if is_bundle(pretrained_model_name_or_path):
+            return cls.from_bundle(pretrained_model_name_or_path)
         if os.path.isdir(pretrained_model_name_or_path):
             config_path = os.path.join(pretrained_model_name_or_path, config_name)
-            weight_path = os.path.join(pretrained_model_name_or_path, weight_name)
+            weight_path = find_weights(
+                os.path.join(pretrained_model_name_or_path, weight_name)
+            )
         else:
             config_path = hf_hub_download(
                 repo_id=pretrained_model_name_or_path, filename=config_name
@@ -66,8 +82,24 @@ class TSR(BaseModule):
         cfg = OmegaConf.load(config_path)
         OmegaConf.resolve(cfg)
         model = cls(cfg)
-        ckpt = torch.load(weight_path, map_location="cpu")
-        model.load_state_dict(ckpt)
+        # parameters take over the memory-mapped tensors instead of copying
+        # them, so the checkpoint is never held in memory twice
+        model.load_state_dict(load_state_dict(weight_path), assign=True)
+        return model
+
+    @classmethod
+    def from_bundle(cls, bundle_dir: str, verify: bool = False):
+        """Build the model from a bundle written by `tsr.bundle.export_bundle`,
+        reading nothing outside `bundle_dir` and never touching the network."""
+        read_manifest(bundle_dir, verify=verify)
+        cfg = OmegaConf.load(os.path.join(bundle_dir, BUNDLE_CONFIG))
+        cfg.image_tokenizer.pretrained_model_name_or_path = os.path.join(
+            bundle_dir, BUNDLE_IMAGE_TOKENIZER
+        )
+        model = cls(cfg)
+        model.load_state_dict(
+            load_state_dict(os.path.join(bundle_dir, BUNDLE_WEIGHTS)), assign=True
+        )
         return model
 
     def configure(self):
@@ -83,6 +115,61 @@ class TSR(BaseModule):
         self.renderer = find_class(self.cfg.renderer_cls)(self.cfg.renderer)
         self.image_processor = ImagePreprocessor()
         self.isosurface_helper = None
+        # one helper per resolution, so concurrent extractions at different
+        # resolutions don't swap the grid out from under each other
+        self._isosurface_helpers: Dict[int, MarchingCubeHelper] = {}
+        # the batcher, job threads and the extract endpoint all get helpers
+        self._isosurface_lock = threading.Lock()
+        self.precision = "fp32"
+        self.compiled_modules: List[str] = []
+        self.quantized_modules: List[str] = []
+
+    def set_precision(self, precision: str, device: str) -> str:
+        """Run inference under autocast: "fp16", "bf16", "fp32", or "auto"
+        for fp16 on CUDA and bf16 on CPUs with native support. Weights stay
+        fp32, and scene codes, density activations and volume compositing
+        are always computed in fp32. Quantized models always run in fp32."""
+        precision = resolve_precision(precision, device)
+        if self.quantized_modules:
+            # the dynamic int8 kernels only take fp32 activations
+            precision = "fp32"
+        self.precision = precision
+        return self.precision
+
+    def fuse_projections(self, fuse: bool = True):
+        """Run the backbone attention with fused QKV (self-attention) and KV
+        (cross-attention) projections. Call after loading the weights and
+        moving the model to its device; not for quantized models, whose
+        linear layers have no float weights to fuse."""
+        for module in self.backbone.modules():
+            if isinstance(module, Attention):
+                module.fuse_projections(fuse)
+
+    def compile(
+        self,
+        mode: str = "default",
+        modules: Tuple[str, ...] = ("backbone", "post_processor", "decoder"),
+    ):
+        """Compile the hot modules with torch.compile for inference.
+
+        Shapes are static: the renderer pads every decoder chunk to the chunk
+        size, so each module compiles once per batch size. Compilation is
+        lazy; run a forward pass and a mesh extraction to pay for it up
+        front. Only `forward` is replaced, so state dict keys don't change.
+        """
+        for name in modules:
+            module = getattr(self, name)
+            module.forward = torch.compile(module.forward, mode=mode, dynamic=False)
+            self.compiled_modules.append(name)
+        self.renderer.set_static_chunks(True)
+
+    def uncompile(self):
+        for name in self.compiled_modules:
+            # drop the instance attribute to get the class's eager forward
+            # back; safe after a compile() that failed part way
+            getattr(self, name).__dict__.pop("forward", None)
+        self.compiled_modules = []
+        self.renderer.set_static_chunks(False)
 
     def forward(
         self,
@@ -101,23 +188,24 @@ class TSR(BaseModule):
         )
         batch_size = rgb_cond.shape[0]
 
-        input_image_tokens: torch.Tensor = self.image_tokenizer(
-            rearrange(rgb_cond, "B Nv H W C -> B Nv C H W", Nv=1),
-        )
+        with autocast(device, self.precision):
+            input_image_tokens: torch.Tensor = self.image_tokenizer(
+                rearrange(rgb_cond, "B Nv H W C -> B Nv C H W", Nv=1),
+            )
 
-        input_image_tokens = rearrange(
-            input_image_tokens, "B Nv C Nt -> B (Nv Nt) C", Nv=1
-        )
+            input_image_tokens = rearrange(
+                input_image_tokens, "B Nv C Nt -> B (Nv Nt) C", Nv=1
+            )
 
-        tokens: torch.Tensor = self.tokenizer(batch_size)
+            tokens: torch.Tensor = self.tokenizer(batch_size)
 
-        tokens = self.backbone(
-            tokens,
-            encoder_hidden_states=input_image_tokens,
-        )
+            tokens = self.backbone(
+                tokens,
+                encoder_hidden_states=input_image_tokens,
+            )
 
-        scene_codes = self.post_processor(self.tokenizer.detokenize(tokens))
-        return scene_codes
+            scene_codes = self.post_processor(self.tokenizer.detokenize(tokens))
+        return scene_codes.float()
 
     def render(
         self,
@@ -151,7 +239,7 @@ class TSR(BaseModule):
         for scene_code in scene_codes:
             images_ = []
             for i in range(n_views):
-                with torch.no_grad():
+                with torch.no_grad(), autocast(scene_code.device, self.precision):
                     image = self.renderer(
                         self.decoder, scene_code, rays_o[i], rays_d[i]
                     )
@@ -160,37 +248,54 @@ class TSR(BaseModule):
 
         return images
 
+    def get_isosurface_helper(self, resolution: int) -> MarchingCubeHelper:
+        with self._isosurface_lock:
+            helper = self._isosurface_helpers.pop(resolution, None)
+            if helper is None:
+                helper = MarchingCubeHelper(resolution)
+            # most recently used last; the CPU grids are large, so keep only a few
+            self._isosurface_helpers[resolution] = helper
+            while len(self._isosurface_helpers) > 2:
+                self._isosurface_helpers.pop(next(iter(self._isosurface_helpers)))
+            return helper
+
     def set_marching_cubes_resolution(self, resolution: int):
-        if (
-            self.isosurface_helper is not None
-            and self.isosurface_helper.resolution == resolution
-        ):
-            return
-        self.isosurface_helper = MarchingCubeHelper(resolution)
-
-    def extract_mesh(self, scene_codes, has_vertex_color, resolution: int = 256, threshold: float = 25.0):
-        self.set_marching_cubes_resolution(resolution)
+        self.isosurface_helper = self.get_isosurface_helper(resolution)
+
+    def extract_mesh(
+        self,
+        scene_codes,
+        has_vertex_color,
+        resolution: int = 256,
+        threshold: float = 25.0,
+        mc_func: Optional[Callable] = None,
+    ):
+        # mc_func replaces torchmcubes.marching_cubes, e.g. to run it in
+        # another process; it takes and returns the same tensors
+        isosurface_helper = self.get_isosurface_helper(resolution)
         meshes = []
         for scene_code in scene_codes:
-            with torch.no_grad():
+            with torch.no_grad(), autocast(scene_code.device, self.precision):
                 density = self.renderer.query_triplane(
                     self.decoder,
                     scale_tensor(
-                        self.isosurface_helper.grid_vertices.to(scene_codes.device),
-                        self.isosurface_helper.points_range,
+                        isosurface_helper.grid_vertices.to(scene_codes.device),
+                        isosurface_helper.points_range,
                         (-self.renderer.cfg.radius, self.renderer.cfg.radius),
                     ),
                     scene_code,
                 )["density_act"]
-            v_pos, t_pos_idx = self.isosurface_helper(-(density - threshold))
+            v_pos, t_pos_idx = isosurface_helper(
+                -(density - threshold), mc_func=mc_func
+            )
             v_pos = scale_tensor(
                 v_pos,
-                self.isosurface_helper.points_range,
+                isosurface_helper.points_range,
                 (-self.renderer.cfg.radius, self.renderer.cfg.radius),
             )
             color = None
             if has_vertex_color:
-                with torch.no_grad():
+                with torch.no_grad(), autocast(scene_code.device, self.precision):
                     color = self.renderer.query_triplane(
                         self.decoder,
                         v_pos,
@@ -1,13 +1,12 @@
+import contextlib
 import importlib
 import math
 from collections import defaultdict
 from dataclasses import dataclass
 from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
-import imageio
 import numpy as np
 import PIL.Image
-import rembg
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -233,6 +232,26 @@ def scale_tensor(dat: torch.FloatTensor, inp_scale: ValidScale, tgt_scale: Valid
     return dat
 
 
+class _TruncExp(torch.autograd.Function):
+    # Implementation from torch-ngp:
+    # https://github.com/ashawkey/torch-ngp/blob/93b08a0d4ec1cc6e69d85df7f0acdfb99603b628/activation.py
+    # Casts to fp32 explicitly, which holds under CUDA and CPU (bf16)
+    # autocast alike; torch.amp.custom_fwd only takes the device type it
+    # casts on from torch 2.4 on.
+    @staticmethod
+    def forward(ctx, x):
+        ctx.save_for_backward(x)
+        return torch.exp(x.float())
+
+    @staticmethod
+    def backward(ctx, g):
+        x = ctx.saved_tensors[0]
+        return (g.float() * torch.exp(x.float().clamp(max=15))).to(x.dtype)
+
+
+trunc_exp = _TruncExp.apply
+
+
 def get_activation(name) -> Callable:
     if name is None:
         return lambda x: x
@@ -241,6 +260,8 @@ def get_activation(name) -> Callable:
         return lambda x: x
     elif name == "exp":
         return lambda x: torch.exp(x)
+    elif name == "trunc_exp":
+        return trunc_exp
     elif name == "sigmoid":
         return lambda x: torch.sigmoid(x)
     elif name == "tanh":
@@ -254,6 +275,36 @@ def get_activation(name) -> Callable:
             raise ValueError(f"Unknown activation function: {name}")
 
 
+PRECISIONS = ("fp32", "fp16", "bf16", "auto")
+
+
+def cpu_supports_bf16() -> bool:
+    # without native bf16 instructions autocast emulates it and is slower
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def resolve_precision(precision: str, device: Union[str, torch.device]) -> str:
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision: {precision}")
+    if precision != "auto":
+        return precision
+    if torch.device(device).type == "cuda":
+        return "fp16"
+    return "bf16" if cpu_supports_bf16() else "fp32"
+
+
+def autocast(device: Union[str, torch.device], precision: str):
+    if precision == "fp32":
+        return contextlib.nullcontext()
+    dtype = torch.float16 if precision == "fp16" else torch.bfloat16
+    return torch.autocast(device_type=torch.device(device).type, dtype=dtype)
+
+
 def get_ray_directions(
     H: int,
     W: int,
@@ -410,10 +461,79 @@ def remove_background(
         do_remove = False
     do_remove = do_remove or force
     if do_remove:
+        import rembg
+
         image = rembg.remove(image, session=rembg_session, **rembg_kwargs)
     return image
 
 
+# sessions whose model takes a fixed 320x320 input, so that several images
+# can be stacked into a single onnxruntime call
+BATCHABLE_REMBG_SESSIONS = ("U2netSession", "U2netpSession", "U2netHumanSegSession")
+
+
+def _predict_masks_batched(
+    rembg_session: Any, images: List[PIL.Image.Image]
+) -> List[PIL.Image.Image]:
+    inputs = [
+        rembg_session.normalize(
+            image.convert("RGB"),
+            (0.485, 0.456, 0.406),
+            (0.229, 0.224, 0.225),
+            (320, 320),
+        )
+        for image in images
+    ]
+    input_name = next(iter(inputs[0]))
+    batch = {input_name: np.concatenate([inp[input_name] for inp in inputs], axis=0)}
+    preds = rembg_session.inner_session.run(None, batch)[0][:, 0, :, :]
+
+    masks = []
+    for pred, image in zip(preds, images):
+        ma, mi = np.max(pred), np.min(pred)
+        pred = (pred - mi) / (ma - mi)
+        mask = Image.fromarray((pred * 255).astype(np.uint8), mode="L")
+        masks.append(mask.resize(image.size, Image.LANCZOS))
+    return masks
+
+
+def remove_background_batch(
+    images: List[PIL.Image.Image],
+    rembg_session: Any = None,
+    force: bool = False,
+    **rembg_kwargs,
+) -> List[PIL.Image.Image]:
+    import rembg
+
+    if rembg_session is None:
+        rembg_session = rembg.new_session()
+    results = list(images)
+    todo = [
+        i
+        for i, image in enumerate(images)
+        if force or not (image.mode == "RGBA" and image.getextrema()[3][0] < 255)
+    ]
+    masks = None
+    if (
+        len(todo) > 1
+        and not rembg_kwargs
+        and type(rembg_session).__name__ in BATCHABLE_REMBG_SESSIONS
+    ):
+        try:
+            masks = _predict_masks_batched(rembg_session, [images[i] for i in todo])
+        except Exception:
+            # e.g. a model exported with a fixed batch dimension
+            masks = None
+    for n, i in enumerate(todo):
+        if masks is None:
+            results[i] = rembg.remove(images[i], session=rembg_session, **rembg_kwargs)
+        else:
+            image = images[i].convert("RGBA")
+            empty = Image.new("RGBA", image.size, 0)
+            results[i] = Image.composite(image, empty, masks[n])
+    return results
+
+
 def resize_foreground(
     image: PIL.Image.Image,
     ratio: float,
@@ -461,6 +581,8 @@ def save_video(
     fps: int = 30,
 ):
     # use imageio to save video
+    import imageio
+
     frames = [np.array(frame) for frame in frames]
     writer = imageio.get_writer(output_path, fps=fps)
     for frame in frames:
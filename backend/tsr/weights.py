@@ -0,0 +1,67 @@
+import argparse
+import os
+from typing import Dict, Optional
+
+import torch
+
+SAFETENSORS_EXT = ".safetensors"
+
+
+def find_weights(weight_path: str) -> str:
+    """`weight_path`, or its .safetensors conversion next to it if there is
+    one, so converting a model directory once is enough to switch."""
+    converted = os.path.splitext(weight_path)[0] + SAFETENSORS_EXT
+    if os.path.exists(converted):
+        return converted
+    return weight_path
+
+
+def load_state_dict(weight_path: str) -> Dict[str, torch.Tensor]:
+    """Memory-map a checkpoint instead of reading it into memory. Load the
+    result with `module.load_state_dict(state_dict, assign=True)` so the
+    parameters become the mapped tensors instead of copies of them."""
+    if weight_path.endswith(SAFETENSORS_EXT):
+        from safetensors.torch import load_file
+
+        return load_file(weight_path, device="cpu")
+    try:
+        return torch.load(weight_path, map_location="cpu", mmap=True)
+    except RuntimeError:
+        # checkpoints in the legacy (pre-zipfile) format can't be mapped
+        return torch.load(weight_path, map_location="cpu")
+
+
+def convert(weight_path: str, output_path: Optional[str] = None) -> str:
+    """Write `weight_path` as safetensors, by default next to it."""
+    from safetensors.torch import save_file
+
+    output_path = output_path or os.path.splitext(weight_path)[0] + SAFETENSORS_EXT
+    state_dict, seen = {}, set()
+    for name, tensor in load_state_dict(weight_path).items():
+        # safetensors refuses tensors that share memory
+        if tensor.data_ptr() in seen:
+            tensor = tensor.clone()
+        seen.add(tensor.data_ptr())
+        state_dict[name] = tensor.contiguous()
+    save_file(state_dict, output_path, metadata={"format": "pt"})
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a TSR checkpoint to safetensors for memory-mapped loading."
+    )
+    parser.add_argument("weight_path", type=str, help="Path to model.ckpt.")
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Defaults to the checkpoint path with a .safetensors extension, "
+        "which TSR.from_pretrained then picks up in its place.",
+    )
+    args = parser.parse_args()
+    print(convert(args.weight_path, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from storage import FilesystemS3Client
+
+MB = 1024**2
+
+
+def default_transfer_config() -> Any:
+    # Meshes and render videos run to tens of MB; split them into 8MB parts
+    # that are sent concurrently instead of a single PUT. boto3 is imported
+    # here so the filesystem store never loads it.
+    from boto3.s3.transfer import TransferConfig
+
+    return TransferConfig(
+        multipart_threshold=8 * MB,
+        multipart_chunksize=8 * MB,
+        max_concurrency=8,
+        use_threads=True,
+    )
+
+
+class Uploader:
+    """Sends artifacts to S3 on a shared thread pool.
+
+    `client` is a boto3 S3 client or anything with the same `upload_file` /
+    `upload_fileobj` signature, such as `storage.FilesystemS3Client`.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        bucket: str,
+        url_for: Callable[[str], str],
+        max_workers: int = 8,
+        transfer_config: Any = None,
+    ):
+        self.client = client
+        self.bucket = bucket
+        self.url_for = url_for
+        self._transfer_config = transfer_config
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="upload"
+        )
+
+    @property
+    def transfer_config(self) -> Any:
+        # built on the first upload; the filesystem store takes no config
+        if self._transfer_config is None and not isinstance(
+            self.client, FilesystemS3Client
+        ):
+            self._transfer_config = default_transfer_config()
+        return self._transfer_config
+
+    def upload_file(
+        self, path: str, key: str, extra_args: Optional[Dict[str, str]] = None
+    ) -> "Future[str]":
+        def _upload():
+            self.client.upload_file(
+                path,
+                self.bucket,
+                key,
+                ExtraArgs=extra_args,
+                Config=self.transfer_config,
+            )
+            return self.url_for(key)
+
+        return self._executor.submit(_upload)
+
+    def upload_fileobj(
+        self, fileobj: Any, key: str, extra_args: Optional[Dict[str, str]] = None
+    ) -> "Future[str]":
+        def _upload():
+            fileobj.seek(0)
+            self.client.upload_fileobj(
+                fileobj,
+                self.bucket,
+                key,
+                ExtraArgs=extra_args,
+                Config=self.transfer_config,
+            )
+            return self.url_for(key)
+
+        return self._executor.submit(_upload)
+
+    def batch(
+        self, on_uploaded: Optional[Callable[[str, str], None]] = None
+    ) -> "UploadBatch":
+        return UploadBatch(self, on_uploaded=on_uploaded)
+
+
+class UploadBatch:
+    """The uploads of a single job, started as soon as each artifact exists.
+
+    `on_uploaded(name, url)` is called from the upload thread as each
+    artifact lands, without waiting for the rest of the batch.
+    """
+
+    def __init__(
+        self,
+        uploader: Uploader,
+        on_uploaded: Optional[Callable[[str, str], None]] = None,
+    ):
+        self.uploader = uploader
+        self.on_uploaded = on_uploaded
+        self._futures: Dict[str, "Future[str]"] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, name: str, future: "Future[str]") -> None:
+        with self._lock:
+            self._futures[name] = future
+        if self.on_uploaded is not None:
+            future.add_done_callback(lambda f: self._notify(name, f))
+
+    def _notify(self, name: str, future: "Future[str]") -> None:
+        if future.exception() is None:
+            self.on_uploaded(name, future.result())
+
+    def add_file(self, name: str, path: str, key: str, **kwargs) -> None:
+        self._add(name, self.uploader.upload_file(path, key, **kwargs))
+
+    def add_fileobj(self, name: str, fileobj: Any, key: str, **kwargs) -> None:
+        self._add(name, self.uploader.upload_fileobj(fileobj, key, **kwargs))
+
+    def wait(self) -> Dict[str, str]:
+        """Block until every upload finished and return the URLs that succeeded."""
+        with self._lock:
+            futures = dict(self._futures)
+        urls = {}
+        for name, future in futures.items():
+            try:
+                urls[name] = future.result()
+            except Exception as e:
+                logging.error(f"Error uploading {name}: {str(e)}")
+        return urls